@@ -0,0 +1,10 @@
+#version 330
+
+uniform sampler2D tex;
+
+in vec2 uv;
+out vec4 f_color;
+
+void main() {
+    f_color = texture(tex, uv);
+}
@@ -0,0 +1,14 @@
+#version 330
+
+uniform Projection {
+    uniform mat4 matrix;
+} proj;
+
+in vec2 in_vert;
+in vec2 in_uv;
+out vec2 uv;
+
+void main() {
+    uv = in_uv;
+    gl_Position = proj.matrix * vec4(in_vert, 0.0, 1.0);
+}
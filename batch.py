@@ -0,0 +1,167 @@
+"""
+Plays many complete headless games with the bot, one seed per task, on every core.
+
+    python batch.py --seeds 0-999 --out batch.jsonl
+
+Every finished game is appended to `--out` as one json line with the options it was played with,
+a restarted batch skips the seeds already there with the same options.
+The aggregate over the whole file is printed and written next to it as <out>.summary.json.
+"""
+import argparse
+import json
+import os
+import platform
+import time
+from multiprocessing import Pool
+from time import perf_counter
+
+import numpy as np
+
+from src import ctx
+from src.bot import Bot
+from src.consts import *
+from src.simulation import Simulation, ENGINES, RATE
+
+## a game still running after this many ticks is stopped
+MAX_TICKS = 60 * 60 * 10
+
+def play(task):
+    """
+    Plays the game of one seed to its end, returns its results.
+    """
+    seed, options = task
+    ctx.profiler.enabled = False
+
+    sim = Simulation(options['width'], options['height'], seed=seed, engine=options['engine'], chunked=options['chunked'], rate=options['rate'])
+    bot = Bot()
+    peak_enemies = 0
+    tick_times = []
+    while not sim.game_over and sim.tick < options['max_ticks']:
+        pressed = bot(sim)
+        t1 = perf_counter()
+        sim.step(pressed)
+        tick_times.append(perf_counter() - t1)
+        peak_enemies = max(peak_enemies, len(sim.enemy_manager))
+    sim.close()
+
+    tick_times = np.array(tick_times) * 1000
+    p50, p95, p99 = np.percentile(tick_times, (50, 95, 99)) if len(tick_times) else (0.0, 0.0, 0.0)
+    return {
+        'seed': seed,
+        'score': int(sim.score),
+        'ticks': sim.tick,
+        'survival': sim.tick * sim.dt,
+        'game_over': sim.game_over,
+        'peak_enemies': peak_enemies,
+        'tick_ms': {'mean': float(tick_times.mean()) if len(tick_times) else 0.0, 'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(tick_times.max(initial=0))},
+        'options': options,
+    }
+
+def load_results(path, options):
+    """
+    Results already in `path` played with `options`, by seed, and the number of results played with other options.
+    A line cut short by an interruption is ignored.
+    """
+    results = {}
+    others = 0
+    if not os.path.exists(path):
+        return results, others
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if result.get('options') != options:
+                others += 1
+                continue
+            results[result['seed']] = result
+    return results, others
+
+def ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+def summarize(results, options):
+    def stats(values):
+        values = np.array(values, dtype=np.float64)
+        p5, p50, p95 = np.percentile(values, (5, 50, 95))
+        return {'mean': float(values.mean()), 'min': float(values.min()), 'p5': float(p5), 'p50': float(p50), 'p95': float(p95), 'max': float(values.max())}
+
+    results = list(results.values())
+    return {
+        'meta': {
+            'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            **options,
+        },
+        'games': len(results),
+        'game_overs': sum(result['game_over'] for result in results),
+        'score': stats([result['score'] for result in results]),
+        'survival': stats([result['survival'] for result in results]),
+        'peak_enemies': stats([result['peak_enemies'] for result in results]),
+        'tick_ms_p50': stats([result['tick_ms']['p50'] for result in results]),
+        'tick_ms_p99': stats([result['tick_ms']['p99'] for result in results]),
+    }
+
+def parse_seeds(text):
+    """
+    "7", "0-999" or "1,5,10-20", ranges include both ends.
+    """
+    seeds = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        seeds.extend(range(int(first), int(last or first) + 1))
+    return seeds
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays many headless games with the bot on a process pool")
+    parser.add_argument('--seeds', type=parse_seeds, default=parse_seeds('0-99'), help="seeds to play, like 0-999 or 1,5,10-20")
+    parser.add_argument('--out', default='batch.jsonl', help="results of every game, appended as they finish")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--max-ticks', type=int, default=MAX_TICKS, help="games still running after this many ticks are stopped")
+    parser.add_argument('--width', type=int, default=GRID_WIDTH)
+    parser.add_argument('--height', type=int, default=GRID_HEIGHT)
+    parser.add_argument('--chunked', action='store_true')
+    parser.add_argument('--engine', choices=ENGINES.keys(), default='object')
+    parser.add_argument('--rate', type=int, default=RATE)
+    args = parser.parse_args()
+
+    options = {'width': args.width, 'height': args.height, 'chunked': args.chunked, 'engine': args.engine, 'rate': args.rate, 'max_ticks': args.max_ticks}
+    results, others = load_results(args.out, options)
+    if others:
+        print(f"{others} results in {args.out} were played with other options, they are left out")
+    todo = [seed for seed in args.seeds if seed not in results]
+    print(f"{len(args.seeds) - len(todo)} of {len(args.seeds)} seeds already in {args.out}, playing {len(todo)} on {args.jobs} processes")
+
+    t1 = perf_counter()
+    with open(args.out, 'a') as f, Pool(args.jobs) as pool:
+        ## after a line cut short by an interruption
+        if f.tell() > 0 and not ends_with_newline(args.out):
+            f.write("\n")
+        for i, result in enumerate(pool.imap_unordered(play, [(seed, options) for seed in todo]), 1):
+            f.write(json.dumps(result) + "\n")
+            f.flush()
+            results[result['seed']] = result
+            print(f"[{i}/{len(todo)}] seed {result['seed']}: score {result['score']}, {result['survival']:.1f}s, {result['peak_enemies']} enemies at most", flush=True)
+    elapsed = perf_counter() - t1
+    if todo:
+        print(f"{len(todo)} games in {elapsed:.1f}s ({len(todo) / elapsed:.2f} games/s)")
+
+    results = {seed: results[seed] for seed in args.seeds if seed in results}
+    if not results:
+        return
+    summary = summarize(results, options)
+    summary_path = os.path.splitext(args.out)[0] + '.summary.json'
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    for name in ('score', 'survival', 'peak_enemies', 'tick_ms_p50', 'tick_ms_p99'):
+        s = summary[name]
+        print(f"{name:14} mean {s['mean']:10.2f}  p5 {s['p5']:10.2f}  p50 {s['p50']:10.2f}  p95 {s['p95']:10.2f}")
+    print(f"summary of {len(results)} games written to {summary_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Microbenchmarks of the simulation hot paths, run headless.
+
+    python bench.py --out bench.json
+    python bench.py --out new.json --compare bench.json --threshold 0.2
+
+Every case is timed `--repeats` times, the fastest run is the one compared against the baseline.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+from statistics import median
+from time import perf_counter
+
+import numpy as np
+import opensimplex
+
+from src import ctx
+from src.consts import *
+from src.enemy_manager import ENEMY_SPEED
+from src.maze import Maze, PackedMaze, SidewinderMaze
+from src.mapgen import carve
+from src.numpy_enemy_manager import NumpyEnemyManager
+from src.simulation import Simulation, DT, ENGINES
+from src.vec import Vec2
+
+ENEMY_COUNTS = (100, 1000, 10000)
+MAP_SIZES = ((33, 19), (65, 37), (129, 73))
+
+def make_sim(width, height, engine='object', enemies=0, seed=0):
+    """
+    Simulation with `enemies` enemies scattered on walkable tiles, moving in random directions,
+    and the pathfinding maps computed towards the player.
+    """
+    sim = Simulation(width=width, height=height, seed=seed, engine=engine)
+    rng = random.Random(seed)
+    walkable = np.flatnonzero(sim.grid.walkable).tolist()
+
+    manager = sim.enemy_manager
+    for _ in range(enemies):
+        x, y = sim.grid.toXY(rng.choice(walkable))
+        manager.spawn(Vec2((x + rng.uniform(0.2, 0.8)) * GRID_SCALE, (y + rng.uniform(0.2, 0.8)) * GRID_SCALE))
+
+    velocities = [(rng.uniform(-0.5, 0.5), rng.uniform(-0.5, 0.5)) for _ in range(enemies)]
+    if isinstance(manager, NumpyEnemyManager):
+        manager.vel[:enemies] = velocities
+    else:
+        for enemy, (vx, vy) in zip(manager.enemies, velocities):
+            enemy.vel = Vec2(vx, vy)
+
+    sim.player.update(DT, defaultdict(bool))
+    manager.computeAccelerationStructure()
+    return sim
+
+def self_collision(sim):
+    manager = sim.enemy_manager
+    if isinstance(manager, NumpyEnemyManager):
+        manager.compute_self_collision()
+    else:
+        for enemy in manager.enemies:
+            manager.compute_self_collision(enemy)
+
+def move_and_collide(sim):
+    manager = sim.enemy_manager
+    if isinstance(manager, NumpyEnemyManager):
+        manager.move_and_collide(manager.vel[:manager.n] * (ENEMY_SPEED * DT))
+    else:
+        for enemy in manager.enemies:
+            enemy.move_and_collide(enemy.vel * ENEMY_SPEED * DT)
+
+def map_cases(map_sizes):
+    for width, height in map_sizes:
+        params = {'map': f"{width}x{height}"}
+
+        yield 'Maze.generate', params, None, lambda w=width, h=height: Maze.generate(w//2 + 1, h//2 + 1)
+        yield 'PackedMaze.generate', params, None, lambda w=width, h=height: PackedMaze.generate(w//2 + 1, h//2 + 1)
+        yield 'SidewinderMaze.generate', params, None, lambda w=width, h=height: SidewinderMaze.generate(w//2 + 1, h//2 + 1)
+
+        def setup(w=width, h=height):
+            return make_sim(w, h, enemies=w * h // 4)
+        center = (width // 2, height // 2)
+        yield 'carve', params, setup, lambda sim: carve(sim.grid, np.random.default_rng(0), opensimplex.OpenSimplex(0))
+        yield 'compute_dijsktra2', params, setup, lambda sim: sim.pathFindingMap.compute_dijsktra2([center])
+        yield 'computeGradient', params, setup, lambda sim: sim.pathFindingMap.computeGradient()
+
+def enemy_cases(map_sizes, enemy_counts, engines):
+    for width, height in map_sizes:
+        for count in enemy_counts:
+            for engine in engines:
+                params = {'map': f"{width}x{height}", 'enemies': count, 'engine': engine}
+
+                def setup(w=width, h=height, n=count, e=engine):
+                    return make_sim(w, h, engine=e, enemies=n)
+
+                yield 'computeAccelerationStructure', params, setup, lambda sim: sim.enemy_manager.computeAccelerationStructure()
+                yield 'compute_self_collision', params, setup, self_collision
+                yield 'update_movement', params, setup, lambda sim: sim.enemy_manager.update_movement(DT)
+                yield 'Entity.move_and_collide', params, setup, move_and_collide
+
+def case_key(name, params):
+    return "/".join([name] + [f"{k}={v}" for k, v in params.items()])
+
+def run_case(setup, fn, repeats):
+    state = setup() if setup else None
+    times = []
+    for _ in range(repeats):
+        if state is not None:
+            ctx.sim = state
+        t1 = perf_counter()
+        fn(state) if setup else fn()
+        t2 = perf_counter()
+        times.append(t2 - t1)
+    if state is not None:
+        state.close()
+    return times
+
+def run(args):
+    cases = list(map_cases(args.maps)) + list(enemy_cases(args.maps, args.enemies, args.engines))
+    results = {}
+    for name, params, setup, fn in cases:
+        if args.only and not any(pattern in name for pattern in args.only):
+            continue
+        key = case_key(name, params)
+        times = run_case(setup, fn, args.repeats)
+        results[key] = {'name': name, **params, 'min': min(times), 'median': median(times), 'repeats': len(times)}
+        print(f"{key:70} {min(times)*1000:10.3f}ms  (median {median(times)*1000:.3f}ms)", flush=True)
+
+    return {
+        'meta': {
+            'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+def compare(current, baseline, threshold):
+    """
+    Prints current/baseline ratios, returns the keys slower than baseline by more than `threshold`.
+    """
+    regressions = []
+    for key, result in current['results'].items():
+        base = baseline['results'].get(key)
+        if base is None:
+            continue
+        ratio = result['min'] / base['min']
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "REGRESSION"
+            regressions.append(key)
+        elif ratio < 1 - threshold:
+            flag = "faster"
+        print(f"{key:70} {base['min']*1000:10.3f}ms -> {result['min']*1000:10.3f}ms  x{ratio:.2f} {flag}")
+    return regressions
+
+def parse_map(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the simulation hot paths")
+    parser.add_argument('--out', default='bench.json', help="where to write the results")
+    parser.add_argument('--compare', default=None, help="baseline results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="relative slowdown reported as a regression")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--enemies', type=int, nargs='+', default=ENEMY_COUNTS)
+    parser.add_argument('--maps', type=parse_map, nargs='+', default=MAP_SIZES, help="map sizes as WIDTHxHEIGHT (odd numbers)")
+    parser.add_argument('--engines', nargs='+', choices=ENGINES.keys(), default=list(ENGINES.keys()))
+    parser.add_argument('--only', nargs='+', default=None, help="only run the benchmarks whose name contains one of these")
+    args = parser.parse_args()
+
+    results = run(args)
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -2,26 +2,29 @@ from math import sin, pi
 import random
 import time
 from collections import defaultdict
-from typing import List
 
-import opensimplex
 import arcade
 
 from src.consts import *
-from src.player import Player
-from src.enemy_manager import EnemyManager
-from src.dijsktra import PathFindingMap
+from src.simulation import Simulation, ENGINES, RATE
+from src.scheduler import FixedStepScheduler
+from src.lod import LOD_BANDS
+from src.broadphase import BROADPHASES
+from src.dijsktra import PathFindingMap, AsyncPathFindingMap, PRECOMPUTED_MAX_TILES
+from src.enemy_renderer import EnemyRenderer
+from src.map_renderer import MapRenderer
+from src.decals import DecalLayer, make_stamps, BLOOD_IMAGE, BLOOD_SCALE, BLOOD_ANGLES
+from src.decal_renderer import DecalRenderer
+from src.replay import Recorder, replay
 from src.vec import Vec2
 from src import ctx
-from src.maze import Maze
 from src.glow import Glow
-from src.grid import Grid
 from src.slider import Slider
 from src.button import TextButton
 
 from pathlib import Path
 
-# from time import perf_counter
+from time import perf_counter
 
 SCREEN_TITLE = "Run Hunt Repeat"
 SCREEN_WIDTH = 1280
@@ -275,159 +278,113 @@ class GameView(arcade.View):
         arcade.set_background_color(arcade.color.AMAZON)
 
         self.camera_center = Vec2(0, 0)
+        self.prev_camera_center = self.camera_center
 
-        self.grid = Grid(
-            width=GRID_WIDTH,
-            height=GRID_HEIGHT,
-            data=Maze.generate(GRID_WIDTH//2 + 1, GRID_HEIGHT//2 + 1).to_grid()
-        )
+        ## paths computed on a worker land on whichever tick they finish, recordings need them synchronous
+        width, height = ctx.map_size
+        path_worker = None if ctx.record_path or ctx.chunked else ctx.path_worker or 'thread'
+        self.sim = Simulation(width, height, seed=ctx.seed, engine=ctx.engine, engine_options=ctx.engine_options, path_mode=ctx.path_mode, path_worker=path_worker, chunked=ctx.chunked, rate=ctx.sim_rate)
+        self.grid = self.sim.grid
 
-        ## remove walls inside radius at center
-        CENTER_HOLE_RADIUS = 1
-        for y in range(-CENTER_HOLE_RADIUS, CENTER_HOLE_RADIUS+1):
-            for x in range(-CENTER_HOLE_RADIUS, CENTER_HOLE_RADIUS+1):
-                i = self.grid.toI(GRID_WIDTH//2 + x, GRID_HEIGHT//2 + y)
-                self.grid[i] = TILE_EMPTY
-
-        ## remove walls at and random and with simplex noise
-        t = int(time.time())
-        opensimplex.seed(t)
-        random.seed(t)
-        for i in range(GRID_HEIGHT * GRID_WIDTH):
-            y = i // GRID_WIDTH
-            x = i % GRID_WIDTH
-
-            # remove wall at random
-            if random.random() > 0.9:
-                self.grid[i] = TILE_EMPTY
-
-            # remove wall based on simple noise
-            if opensimplex.noise2(x*0.4, y*0.4) > 0.2:
-                self.grid[i] = TILE_EMPTY
+        self.recorder = Recorder(self.sim.settings) if ctx.record_path else None
 
         ## walls and floor
-        self.shape_list_map_1_wall = arcade.ShapeElementList()
-        self.shape_list_map_1_empty = arcade.ShapeElementList()
-        self.shape_list_map_2_wall = arcade.ShapeElementList()
-        self.shape_list_map_2_empty = arcade.ShapeElementList()
-        for i in range(GRID_HEIGHT * GRID_WIDTH):
-            y = i // GRID_WIDTH
-            x = i % GRID_WIDTH
-
-            if self.grid[i] == TILE_WALL:
-                shape_1 = arcade.create_rectangle_filled(
-                    center_x=x*GRID_SCALE + GRID_SCALE/2,
-                    center_y=y*GRID_SCALE + GRID_SCALE/2,
-                    width=GRID_SCALE,
-                    height=GRID_SCALE,
-                    color=COLOR_DARK)
-
-                shape_2 = arcade.create_rectangle_filled(
-                    center_x=x*GRID_SCALE + GRID_SCALE/2,
-                    center_y=y*GRID_SCALE + GRID_SCALE/2,
-                    width=GRID_SCALE,
-                    height=GRID_SCALE,
-                    color=COLOR_BRIGHT_2)
-
-                self.shape_list_map_1_wall.append(shape_1)
-                self.shape_list_map_2_wall.append(shape_2)
-
-            if self.grid[i] == TILE_EMPTY:
-                shape_1 = arcade.create_rectangle_filled(
-                    center_x=x*GRID_SCALE + GRID_SCALE/2,
-                    center_y=y*GRID_SCALE + GRID_SCALE/2,
-                    width=GRID_SCALE,
-                    height=GRID_SCALE,
-                    color=COLOR_BRIGHT_2)
-
-                shape_2 = arcade.create_rectangle_filled(
-                    center_x=x*GRID_SCALE + GRID_SCALE/2,
-                    center_y=y*GRID_SCALE + GRID_SCALE/2,
-                    width=GRID_SCALE,
-                    height=GRID_SCALE,
-                    color=COLOR_DARK)
-
-                self.shape_list_map_1_empty.append(shape_1)
-                self.shape_list_map_2_empty.append(shape_2)
-
-        self.pathFindingMap = PathFindingMap(self)
-
-        self.player = Player(x=(GRID_WIDTH*GRID_SCALE)/2, y=(GRID_HEIGHT*GRID_SCALE)/2)
-        self.enemy_manager = EnemyManager()
+        self.map_renderer = MapRenderer(self.window.ctx, self.grid)
+
+        self.enemy_renderer = EnemyRenderer(self.window.ctx)
 
         ## blood
-        self.blood_splashes: List[Vec2] = []
-        self.sprite_list_blood = arcade.SpriteList()
-        arcade.Sprite("assets/blood.png", scale=0.002) # preload this sprite
+        self.blood_stamps = make_stamps(BLOOD_IMAGE, BLOOD_SCALE, BLOOD_ANGLES)
+        self.blood_layer = DecalLayer()
+        self.blood_renderer = DecalRenderer(self.window.ctx, self.blood_layer)
 
-        self.partial_dt = 0
-        self.score = 0
-        self.sound_limit = 0
+        self.scheduler = FixedStepScheduler(ctx.sim_rate, ctx.max_steps)
+        self.show_profiler = False
+
+    def save_recording(self):
+        if self.recorder is not None:
+            self.recorder.save(ctx.record_path, self.sim)
+            self.recorder = None
 
     def end_game(self):
+        self.save_recording()
+        self.sim.close()
         arcade.play_sound(SOUND_GAME_OVER, volume=ctx.volume)
-        self.window.show_view( GameOverView(self.score) )
+        self.window.show_view( GameOverView(self.sim.score) )
 
     def on_draw(self):
-        glow_enabled = self.enemy_manager.rage_mode
+        profiler = ctx.profiler
+        profiler.next_frame()
+
+        with profiler.section('draw'):
+            self.draw_game(profiler)
 
-        if glow_enabled:
-            self.glow.use()
+        if self.show_profiler:
+            self.draw_profiler(profiler)
 
-        bg_color = COLOR_BRIGHT if self.enemy_manager.rage_mode else COLOR_DARK
+    def draw_game(self, profiler):
+        glow_enabled = self.sim.enemy_manager.rage_mode
+        ## how far the frame is between the last two steps
+        alpha = self.scheduler.alpha
+        camera_center = self.prev_camera_center + (self.camera_center - self.prev_camera_center) * alpha
 
-        if glow_enabled:
-            self.glow.fb.clear(bg_color)
+        with profiler.section('draw.clear'):
+            if glow_enabled:
+                self.glow.use()
 
-        if self.enemy_manager.rage_mode:
-            self.clear(COLOR_BRIGHT)
-        else:
-            self.clear(bg_color)
+            bg_color = COLOR_BRIGHT if self.sim.enemy_manager.rage_mode else COLOR_DARK
+
+            if glow_enabled:
+                self.glow.fb.clear(bg_color)
+
+            if self.sim.enemy_manager.rage_mode:
+                self.clear(COLOR_BRIGHT)
+            else:
+                self.clear(bg_color)
 
 
         # arcade.set_viewport(0, GRID_WIDTH*GRID_SCALE, 0, GRID_HEIGHT*GRID_SCALE)
         ratio = self.window.aspect_ratio
-        arcade.set_viewport(
-            left=self.camera_center.x - VIEWPORT_WIDTH/2,
-            right=self.camera_center.x + VIEWPORT_WIDTH/2,
-            bottom=self.camera_center.y - VIEWPORT_WIDTH/ratio/2,
-            top=self.camera_center.y + VIEWPORT_WIDTH/ratio/2
+        viewport = (
+            camera_center.x - VIEWPORT_WIDTH/2,
+            camera_center.x + VIEWPORT_WIDTH/2,
+            camera_center.y - VIEWPORT_WIDTH/ratio/2,
+            camera_center.y + VIEWPORT_WIDTH/ratio/2
         )
+        arcade.set_viewport(*viewport)
 
+        with profiler.section('draw.chunks'):
+            map_meshes = self.map_renderer.visible(*viewport)
 
-        if self.enemy_manager.rage_mode:
-            self.shape_list_map_2_empty.draw()
-        else:
-            self.shape_list_map_1_empty.draw()
+        with profiler.section('draw.floor'):
+            self.map_renderer.draw_floor(map_meshes, self.sim.enemy_manager.rage_mode)
 
-        self.sprite_list_blood.draw()
+        with profiler.section('draw.blood'):
+            self.blood_renderer.draw()
 
-        if self.enemy_manager.rage_mode:
-            self.shape_list_map_2_wall.draw()
-        else:
-            self.shape_list_map_1_wall.draw()
+        with profiler.section('draw.walls'):
+            self.map_renderer.draw_walls(map_meshes, self.sim.enemy_manager.rage_mode)
 
-        self.player.draw()
-        self.enemy_manager.draw()
-
-        # t1 = perf_counter()
-        # t2 = perf_counter()
-        # print(f"Elapsed time: {(t2 - t1)*1000:.2f}ms {len(self.enemy_manager.enemies)}")
+        with profiler.section('draw.player'):
+            self.sim.player.draw(alpha)
+        with profiler.section('draw.enemies'):
+            self.enemy_renderer.draw(self.sim.enemy_manager, alpha)
 
         ## draws gradient map
         if False:
-            if self.pathFindingMap.gradient:
+            if self.sim.pathFindingMap.directions is not None:
                 for i in range(GRID_HEIGHT * GRID_WIDTH):
                     y = i // GRID_WIDTH
                     x = i % GRID_WIDTH
 
                     startx = x*GRID_SCALE + GRID_SCALE/2
                     starty = y*GRID_SCALE + GRID_SCALE/2
+                    direction = self.sim.pathFindingMap.direction(i, self.sim.enemy_manager.rage_mode)
                     arcade.draw_line(
                         startx,
                         starty,
-                        startx + self.pathFindingMap.gradient[i].x,
-                        starty + self.pathFindingMap.gradient[i].y,
+                        startx + direction.x,
+                        starty + direction.y,
                         arcade.color.RED, line_width=0.2)
 
         arcade.set_viewport(0, self.window.width, 0, self.window.height)
@@ -437,55 +394,65 @@ class GameView(arcade.View):
             for i in range(GRID_HEIGHT * GRID_WIDTH - 100):
                 y = i // GRID_WIDTH
                 x = i % GRID_WIDTH
-                arcade.draw_text(str(self.pathFindingMap.dijkstra[i]),
+                arcade.draw_text(str(self.sim.pathFindingMap.dijkstra[i]),
                     start_x=x * (self.window.width/(GRID_WIDTH*GRID_SCALE)) * GRID_SCALE + GRID_SCALE/2,
                     start_y=y * (self.window.width/(GRID_WIDTH*GRID_SCALE)) * GRID_SCALE + GRID_SCALE/2,
                     color=arcade.color.RED)
 
-        time_factor = 1
-        tm = (self.enemy_manager.until_rage + time_factor/2) % RAGE_DELAY
+        with profiler.section('draw.glow'):
+            time_factor = 1
+            tm = (self.sim.enemy_manager.until_rage + time_factor/2) % RAGE_DELAY
 
-        if tm < time_factor:
-            bright = COLOR_BRIGHT if glow_enabled else COLOR_BRIGHT_2
-            color = bright if self.enemy_manager.rage_mode == (tm > time_factor/2) else COLOR_DARK
-            border_width = sin((tm) / time_factor * pi) * min(self.window.height, self.window.width)
-            arcade.draw_rectangle_outline(self.window.width / 2, self.window.height / 2, self.window.width, self.window.height, color, border_width)
+            if tm < time_factor:
+                bright = COLOR_BRIGHT if glow_enabled else COLOR_BRIGHT_2
+                color = bright if self.sim.enemy_manager.rage_mode == (tm > time_factor/2) else COLOR_DARK
+                border_width = sin((tm) / time_factor * pi) * min(self.window.height, self.window.width)
+                arcade.draw_rectangle_outline(self.window.width / 2, self.window.height / 2, self.window.width, self.window.height, color, border_width)
 
-        if glow_enabled:
-            self.glow.render(self.window.ctx.screen)
+            if glow_enabled:
+                self.glow.render(self.window.ctx.screen)
 
-        arcade.draw_text(f"Score: {int(self.score)}", self.window.width/2, self.window.height-20, color=arcade.color.SAE, anchor_x='center', anchor_y='center', font_name=FONT, font_size=16)
+        with profiler.section('draw.hud'):
+            arcade.draw_text(f"Score: {int(self.sim.score)}", self.window.width/2, self.window.height-20, color=arcade.color.SAE, anchor_x='center', anchor_y='center', font_name=FONT, font_size=16)
 
-    def alloc_sound(self):
-        if self.sound_limit > 1:
-            self.sound_limit -= 1
-            return True
-        return False
+    def draw_profiler(self, profiler):
+        """
+        p50/p95/p99 of every section, toggled with F3.
+        """
+        arcade.draw_lrtb_rectangle_filled(0, 560, self.window.height, self.window.height - 20 - 16 * len(profiler.sections), (0, 0, 0, 180))
+        for i, line in enumerate(profiler.report()):
+            arcade.draw_text(line, 8, self.window.height - 20 - 16 * i, color=arcade.color.WHITE, font_name="monospace", font_size=10)
 
     def on_update(self, dt):
-        self.score += SCORE_PER_SECOND * dt
-        self.partial_dt += dt
-        if self.sound_limit < 8:
-            self.sound_limit += 8 * dt
-        DT = 1/60
-        if self.partial_dt > 1:
-            self.partial_dt = 1
-        while self.partial_dt > DT:
-            self.partial_dt -= DT
-            self.player.update(DT)
-
-            self.enemy_manager.update(DT)
-
-            for x, y in self.blood_splashes:
-                blood_sprite = arcade.Sprite("assets/blood.png", scale=0.002, center_x=x, center_y=y, angle=random.randrange(0, 360))
-                self.sprite_list_blood.append(blood_sprite)
-            self.blood_splashes = []
-
-            self.camera_center = self.camera_center + (self.player.pos - self.camera_center) * 0.3
+        for _ in range(self.scheduler.advance(dt)):
+            if self.recorder is not None:
+                self.recorder.record(self.pressed)
+            with ctx.profiler.section('step'):
+                self.sim.step(self.pressed)
+
+            with ctx.profiler.section('sounds'):
+                for sound in self.sim.sounds:
+                    arcade.play_sound(sound, volume=ctx.volume)
+
+            with ctx.profiler.section('blood'):
+                for x, y in self.sim.blood_splashes:
+                    self.blood_layer.stamp(x, y, random.choice(self.blood_stamps))
+
+            if self.sim.game_over:
+                self.end_game()
+                return
+
+            self.prev_camera_center = self.camera_center
+            ## closes 30% of the gap per tuning step
+            follow = 1 - 0.7 ** (self.sim.dt / TUNING_DT)
+            self.camera_center = self.camera_center + (self.sim.player.pos - self.camera_center) * follow
 
     def on_key_press(self, key, key_modifiers):
         self.pressed[key] = True
 
+        if key == arcade.key.F3:
+            self.show_profiler = not self.show_profiler
+
         if key == arcade.key.F11:
             self.window.set_fullscreen(
                 True - self.window.fullscreen
@@ -502,6 +469,53 @@ class GameView(arcade.View):
         self.glow.gen_fbs((width, height))
 
 
+def run_headless(ticks, seed=None, engine='object', engine_options=None, path_mode='full', path_worker=None, profile=False, width=GRID_WIDTH, height=GRID_HEIGHT, chunked=False, rate=RATE):
+    """
+    Steps a simulation as fast as possible with no input, no window and no GL context.
+    """
+    t0 = perf_counter()
+    sim = Simulation(width, height, seed=seed, engine=engine, engine_options=engine_options, path_mode=path_mode, path_worker=path_worker, chunked=chunked, rate=rate)
+    print(f"{width}x{height} map ready in {perf_counter() - t0:.3f}s")
+    pressed = defaultdict(bool)
+    game_over_tick = None
+
+    t1 = perf_counter()
+    for _ in range(ticks):
+        ctx.profiler.next_frame()
+        sim.step(pressed)
+        if sim.game_over and game_over_tick is None:
+            game_over_tick = sim.tick
+    t2 = perf_counter()
+    sim.close()
+
+    elapsed = t2 - t1
+    print(f"seed {sim.seed}: {ticks} ticks in {elapsed:.3f}s ({ticks / elapsed:.0f} ticks/s, {elapsed / ticks * 1000:.3f}ms/tick)")
+    print(f"enemies: {len(sim.enemy_manager)}, score: {int(sim.score)}, game over at tick: {game_over_tick}")
+    if sim.enemy_manager.lod_bands:
+        print(f"level of detail: {sim.enemy_manager.updates / ticks:.1f} enemy updates/tick")
+
+    broadphase = getattr(sim.enemy_manager, 'broadphase', None)
+    if broadphase is not None:
+        print(f"broadphase {type(broadphase).__name__}: {broadphase.total_pairs / max(broadphase.calls, 1):.1f} candidate pairs/tick")
+
+    if chunked:
+        print(f"chunks: {len(sim.grid.chunks)} loaded, {sim.grid.generated} generated, {sim.grid.evicted} evicted")
+
+    if profile:
+        for line in ctx.profiler.report():
+            print(line)
+
+def run_replay(path):
+    t1 = perf_counter()
+    sim, identical = replay(path)
+    t2 = perf_counter()
+
+    elapsed = t2 - t1
+    print(f"seed {sim.seed}: {sim.tick} ticks replayed in {elapsed:.3f}s ({sim.tick / max(elapsed, 1e-9):.0f} ticks/s)")
+    print(f"enemies: {len(sim.enemy_manager)}, score: {int(sim.score)}, game over: {sim.game_over}")
+    print("final state identical to the recording" if identical else "final state DIFFERS from the recording")
+    return identical
+
 def main():
     window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, resizable=True)
     window.set_minimum_size(720, 480)
@@ -516,9 +530,73 @@ def main():
 
     arcade.run()
 
+    ## window closed mid game
+    if isinstance(ctx.game, GameView):
+        ctx.game.save_recording()
+
 if __name__ == "__main__":
     import sys
     import os
+    import argparse
+    import atexit
     if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
         os.chdir(sys._MEIPASS)
-    main()
\ No newline at end of file
+
+    parser = argparse.ArgumentParser(description=SCREEN_TITLE)
+    parser.add_argument('--headless', action='store_true', help="run the simulation without a window")
+    parser.add_argument('--ticks', type=int, default=3600, help="number of ticks to run in headless mode")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--width', type=int, default=GRID_WIDTH, help="map width in tiles, odd")
+    parser.add_argument('--height', type=int, default=GRID_HEIGHT, help="map height in tiles, odd")
+    parser.add_argument('--chunked', action='store_true', help="generate the map in chunks around the player and the enemies")
+    parser.add_argument('--rate', type=int, default=RATE, help="simulation steps per second")
+    parser.add_argument('--max-steps', type=int, default=ctx.max_steps, help="simulation steps per frame at most, the simulation slows down past that")
+    parser.add_argument('--engine', choices=ENGINES.keys(), default='object', help="enemy engine")
+    parser.add_argument('--broadphase', choices=BROADPHASES.keys(), default=None, help="separation broadphase of the numpy engine")
+    parser.add_argument('--lod', action='store_true', help="update the enemies far from the player less often, see src/lod.py")
+    parser.add_argument('--paths', choices=PathFindingMap.MODES, default='full', help="pathfinding update mode")
+    parser.add_argument('--async-paths', choices=AsyncPathFindingMap.WORKERS, default=None, help="update the pathfinding maps on a worker thread or process")
+    parser.add_argument('--record', default=None, help="record the inputs of the game sessions to this file")
+    parser.add_argument('--replay', default=None, help="re-run a recording headless and check it ends in the same state")
+    parser.add_argument('--profile', action='store_true', help="print the per subsystem timings in headless mode")
+    parser.add_argument('--profile-csv', default=None, help="write the per subsystem timings to this csv file at exit")
+    args = parser.parse_args()
+
+    engine_options = {}
+    if args.broadphase:
+        if args.engine != 'numpy':
+            parser.error("--broadphase requires --engine numpy")
+        engine_options['broadphase'] = args.broadphase
+    if args.lod:
+        engine_options['lod_bands'] = LOD_BANDS
+    if args.chunked and args.broadphase == 'grid':
+        parser.error("the grid broadphase allocates the whole map, it can't be used with --chunked")
+    if args.chunked and args.async_paths:
+        parser.error("--chunked computes the paths synchronously")
+    if args.record and args.async_paths:
+        parser.error("paths computed on a worker land on whichever tick they finish, --record needs them synchronous")
+    if args.chunked and args.paths == 'precomputed':
+        parser.error("the precomputed paths are an all-pairs table of the whole map, they can't be used with --chunked")
+    if args.paths == 'precomputed' and args.width * args.height > PRECOMPUTED_MAX_TILES:
+        parser.error(f"the precomputed paths table grows with the square of the map, it is limited to {PRECOMPUTED_MAX_TILES} tiles")
+
+    if args.profile_csv:
+        atexit.register(ctx.profiler.dump_csv, args.profile_csv)
+
+    ctx.seed = args.seed
+    ctx.record_path = args.record
+    ctx.map_size = (args.width, args.height)
+    ctx.chunked = args.chunked
+    ctx.sim_rate = args.rate
+    ctx.max_steps = args.max_steps
+    ctx.engine = args.engine
+    ctx.engine_options = engine_options
+    ctx.path_mode = args.paths
+    ctx.path_worker = args.async_paths
+
+    if args.replay:
+        sys.exit(0 if run_replay(args.replay) else 1)
+    elif args.headless:
+        run_headless(args.ticks, args.seed, args.engine, engine_options, args.paths, args.async_paths, args.profile, args.width, args.height, args.chunked, args.rate)
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,67 @@
+import math
+from collections import defaultdict
+
+import arcade
+
+from src.consts import *
+
+## (dx, dy) and the keys that move the player that way
+MOVES = [
+    ((dx, dy), [key for key, on in (
+        (arcade.key.RIGHT, dx > 0), (arcade.key.LEFT, dx < 0), (arcade.key.UP, dy > 0), (arcade.key.DOWN, dy < 0),
+    ) if on])
+    for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)
+]
+
+class Bot:
+    """
+    Input policy for unattended games, deterministic so a seed always plays the same game.
+    Every tick it looks `lookahead` world units ahead in the 8 directions, skips the ones running into a wall,
+    and takes the one closest to the nearest enemy in rage mode, the one away from the enemies within `radius` otherwise.
+    """
+    def __init__(self, lookahead=GRID_SCALE, radius=GRID_SCALE * 12):
+        self.lookahead = lookahead
+        self.radius = radius
+        self.last_move = None
+
+    def blocked(self, grid, x, y):
+        half_size = PLAYER_SIZE / 2
+        return any(grid.tile_at(x + sx, y + sy) != TILE_EMPTY for sx in (-half_size, half_size) for sy in (-half_size, half_size))
+
+    def score(self, x, y, enemies, rage_mode):
+        if rage_mode:
+            return -min((math.hypot(ex - x, ey - y) for ex, ey in enemies), default=0.0)
+        danger = 0.0
+        for ex, ey in enemies:
+            d = math.hypot(ex - x, ey - y)
+            if d < self.radius:
+                danger += 1.0 / max(d, 0.1) ** 2
+        return -danger
+
+    def __call__(self, sim):
+        """
+        The keys to press for the next step of `sim`.
+        """
+        px, py = sim.player.pos.x, sim.player.pos.y
+        rage_mode = sim.enemy_manager.rage_mode
+        enemies = [(x, y) for x, y in sim.enemy_manager.positions()]
+
+        best, best_score = None, -math.inf
+        for move, keys in MOVES:
+            ln = math.hypot(*move)
+            x, y = px + move[0] / ln * self.lookahead, py + move[1] / ln * self.lookahead
+            if self.blocked(sim.grid, x, y):
+                continue
+            score = self.score(x, y, enemies, rage_mode)
+            ## keeps going the same way between equivalent choices
+            if move == self.last_move:
+                score += 1e-3
+            if score > best_score:
+                best, best_score = (move, keys), score
+
+        pressed = defaultdict(bool)
+        if best is not None:
+            self.last_move = best[0]
+            for key in best[1]:
+                pressed[key] = True
+        return pressed
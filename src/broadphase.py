@@ -0,0 +1,138 @@
+import math
+
+import numpy as np
+
+from src.consts import *
+
+NEIGHBOUR_OFFSETS = np.array([(x, y) for y in (-1, 0, 1) for x in (-1, 0, 1)], dtype=np.int64)
+
+def expand_ranges(owner, first, counts):
+    """
+    Expands the ranges [first, first+count) into flat (owner, index) arrays.
+    """
+    total = int(counts.sum())
+    owners = np.repeat(owner, counts)
+    index = np.repeat(first - (np.cumsum(counts) - counts), counts) + np.arange(total, dtype=np.int64)
+    return owners, index
+
+class Broadphase:
+    """
+    Finds candidate pairs of points closer than `cell_size` on both axes.
+    `pairs` returns directed (i, j) index arrays with i != j, every close pair is there in both directions.
+    Cell based backends visit at most `max_neighbours` points per neighbour cell of a point.
+    `width` and `height` are the size of the world the points live in.
+    """
+    def __init__(self, cell_size, max_neighbours, width=GRID_WIDTH*GRID_SCALE, height=GRID_HEIGHT*GRID_SCALE):
+        self.cell_size = cell_size
+        self.max_neighbours = max_neighbours
+        self.width = width
+        self.height = height
+
+        self.pair_count = 0
+        self.total_pairs = 0
+        self.calls = 0
+
+    def pairs(self, pos):
+        if len(pos) == 0:
+            i = j = np.zeros(0, dtype=np.int64)
+        else:
+            i, j = self.compute_pairs(pos)
+
+        self.pair_count = len(i)
+        self.total_pairs += len(i)
+        self.calls += 1
+        return i, j
+
+    def compute_pairs(self, pos):
+        raise NotImplementedError
+
+    def bucket_starts(self, n_buckets):
+        return np.zeros(n_buckets + 1, dtype=np.int64)
+
+    def cells_pairs(self, cell_ids, neighbour_ids, n_buckets):
+        """
+        Counting sort of `cell_ids` into `n_buckets`, then gathers the content of the 9 `neighbour_ids` of each point.
+        """
+        n = len(cell_ids)
+        order = np.argsort(cell_ids, kind='stable')
+        start = self.bucket_starts(n_buckets)
+        np.cumsum(np.bincount(cell_ids, minlength=n_buckets), out=start[1:])
+
+        neighbour_ids = neighbour_ids.ravel()
+        first = start[neighbour_ids]
+        counts = np.minimum(start[neighbour_ids + 1] - first, self.max_neighbours)
+
+        owner, k = expand_ranges(np.arange(n * 9, dtype=np.int64) // 9, first, counts)
+        j = order[k]
+        mask = owner != j
+        return owner[mask], j[mask]
+
+class HashedBroadphase(Broadphase):
+    """
+    Cells hashed modulo the point count, unrelated cells can share a bucket.
+    A bucket shared by several neighbour cells of a point is visited once, so pairs are not repeated.
+    """
+    def hash(self, x, y, count):
+        h = y*self.width + x
+        return np.abs(h) % count
+
+    def compute_pairs(self, pos):
+        n = len(pos)
+        cells = np.floor(pos / self.cell_size).astype(np.int64)
+        neighbours = cells[:, None, :] + NEIGHBOUR_OFFSETS[None, :, :]
+
+        neighbour_ids = np.sort(self.hash(neighbours[..., 0], neighbours[..., 1], n), axis=1)
+        ## repeats of a bucket point to bucket n instead, which stays empty
+        neighbour_ids[:, 1:][neighbour_ids[:, 1:] == neighbour_ids[:, :-1]] = n
+
+        return self.cells_pairs(self.hash(cells[:, 0], cells[:, 1], n), neighbour_ids, n + 1)
+
+class DenseGridBroadphase(Broadphase):
+    """
+    One bucket per cell of the map plus a one cell border, so neighbour lookups never wrap.
+    The bucket table is allocated once and reused every tick.
+    """
+    def __init__(self, cell_size, max_neighbours, width=GRID_WIDTH*GRID_SCALE, height=GRID_HEIGHT*GRID_SCALE):
+        super().__init__(cell_size, max_neighbours, width, height)
+        self.cols = math.ceil(width / cell_size) + 2
+        self.rows = math.ceil(height / cell_size) + 2
+        self.start = np.zeros(self.cols * self.rows + 1, dtype=np.int64)
+        self.offsets = NEIGHBOUR_OFFSETS[:, 1] * self.cols + NEIGHBOUR_OFFSETS[:, 0]
+
+    def bucket_starts(self, n_buckets):
+        return self.start
+
+    def compute_pairs(self, pos):
+        cells = np.floor(pos / self.cell_size).astype(np.int64) + 1
+        np.clip(cells[:, 0], 1, self.cols - 2, out=cells[:, 0])
+        np.clip(cells[:, 1], 1, self.rows - 2, out=cells[:, 1])
+
+        ids = cells[:, 1] * self.cols + cells[:, 0]
+        return self.cells_pairs(ids, ids[:, None] + self.offsets[None, :], self.cols * self.rows)
+
+class SweepBroadphase(Broadphase):
+    """
+    Sort and sweep along x, candidates of a point are the next points closer than `cell_size` on x,
+    filtered on y. The sweep window is not capped, so crowding along x costs quadratically.
+    """
+    def compute_pairs(self, pos):
+        n = len(pos)
+        order = np.argsort(pos[:, 0], kind='stable')
+        xs = pos[order, 0]
+        ys = pos[order, 1]
+
+        a = np.arange(n, dtype=np.int64)
+        end = np.searchsorted(xs, xs + self.cell_size, side='left')
+        counts = np.maximum(end - a - 1, 0)
+
+        a, b = expand_ranges(a, a + 1, counts)
+        mask = np.abs(ys[b] - ys[a]) < self.cell_size
+        i = order[a[mask]]
+        j = order[b[mask]]
+        return np.concatenate((i, j)), np.concatenate((j, i))
+
+BROADPHASES = {
+    'hashed': HashedBroadphase,
+    'grid': DenseGridBroadphase,
+    'sweep': SweepBroadphase,
+}
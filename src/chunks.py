@@ -0,0 +1,267 @@
+import math
+import random
+
+import numpy as np
+import opensimplex
+
+from src.consts import *
+from src.grid import Grid
+from src.maze import PackedMaze
+from src.mapgen import carve_tiles, open_hole
+from src.dijsktra import PathFindingMap, DIRECTION_VECS, NO_DIRECTION
+
+## tiles per chunk side, even so every chunk holds a whole maze plus one row and column of walls with doors
+CHUNK_SIZE = 32
+## chunks kept in memory, each one is CHUNK_SIZE² bytes of tiles plus its render geometry
+MAX_CHUNKS = 1024
+## chunks loaded and kept around the player and the enemies
+ACTIVE_RADIUS = 1
+DOORS_PER_SIDE = 2
+
+## chunks covered by the pathfinding maps on each side of the player's chunk
+PATH_RADIUS = 2
+
+class Chunk:
+    def __init__(self, tiles):
+        self.tiles = tiles
+        ## flat copy for the scalar lookups of the collision code
+        self.cells = tiles.tobytes()
+        self.last_active = 0
+
+class ChunkedGrid(Grid):
+    """
+    Grid of `width` x `height` tiles generated CHUNK_SIZE x CHUNK_SIZE tiles at a time, the first time they are read.
+    Each chunk is built from its own seed (a maze, doors towards its east and north neighbours, then
+    carve_tiles with noise in map coordinates), so evicted chunks come back identical.
+    Only the coordinate helpers of Grid are shared, the whole map is never allocated.
+    """
+    def __init__(self, width, height, seed, chunk_size=CHUNK_SIZE, max_chunks=MAX_CHUNKS):
+        assert chunk_size % 2 == 0, "chunks hold chunk_size//2 maze cells"
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+
+        self.noise = opensimplex.OpenSimplex(seed)
+        self.chunks = {}
+        self.clock = 0
+        ## chunks around the last activity, and covered by the last window()
+        self.active = set()
+        self.pinned = set()
+
+        self.generated = 0
+        self.evicted = 0
+
+    def __getstate__(self):
+        raise TypeError("chunked grids can't be sent to another process")
+
+    def __getitem__(self, index):
+        x, y = self.toXY(index)
+        return self.tile(x, y)
+
+    def __setitem__(self, index, value):
+        raise TypeError("chunked grids are read only")
+
+    def generate_chunk(self, cx, cy):
+        cs = self.chunk_size
+        x0, y0 = cx * cs, cy * cs
+        rng = random.Random(f"{self.seed}/{cx}/{cy}")
+
+        tiles = np.full((cs, cs), TILE_WALL, dtype=np.uint8)
+        tiles[:cs-1, :cs-1] = PackedMaze.generate(cs//2, cs//2, rng).tiles()
+
+        ## doors through the walls shared with the east and north chunks, on maze cell rows / columns
+        for door in rng.sample(range(0, cs - 1, 2), DOORS_PER_SIDE):
+            tiles[door, cs-1] = TILE_EMPTY
+        for door in rng.sample(range(0, cs - 1, 2), DOORS_PER_SIDE):
+            tiles[cs-1, door] = TILE_EMPTY
+
+        carve_tiles(tiles, np.random.default_rng(rng.getrandbits(64)), self.noise, x0, y0)
+        open_hole(tiles, self.width//2, self.height//2, 1, x0, y0)
+
+        ## outside of the map
+        tiles[max(self.height - y0, 0):, :] = TILE_WALL
+        tiles[:, max(self.width - x0, 0):] = TILE_WALL
+        return tiles
+
+    def chunk(self, cx, cy):
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            chunk = self.chunks[(cx, cy)] = Chunk(self.generate_chunk(cx, cy))
+            chunk.last_active = self.clock
+            self.generated += 1
+            if len(self.chunks) > self.max_chunks:
+                self.evict()
+        return chunk
+
+    def evict(self):
+        """
+        Drops the chunks that have been away from any activity the longest, down to 3/4 of the cap.
+        The chunks around the last activity and the last window are kept, even over the cap.
+        """
+        kept = self.active | self.pinned
+        idle = [key for key in self.chunks if key not in kept]
+        idle.sort(key=lambda key: self.chunks[key].last_active)
+        for key in idle[:len(self.chunks) - self.max_chunks * 3 // 4]:
+            del self.chunks[key]
+            self.evicted += 1
+
+    def update_activity(self, positions):
+        """
+        Loads the chunks around the world `positions` (player and enemies) and marks them as active.
+        """
+        self.clock += 1
+        cs = self.chunk_size * GRID_SCALE
+        keys = {(math.floor(x / cs), math.floor(y / cs)) for x, y in positions}
+        self.active = {
+            (nx, ny)
+            for cx, cy in keys
+            for ny in range(cy - ACTIVE_RADIUS, cy + ACTIVE_RADIUS + 1)
+            for nx in range(cx - ACTIVE_RADIUS, cx + ACTIVE_RADIUS + 1)
+            if self.is_chunk_in_grid(nx, ny)
+        }
+        for nx, ny in self.active:
+            self.chunk(nx, ny).last_active = self.clock
+
+    def is_chunk_in_grid(self, cx, cy):
+        cs = self.chunk_size
+        return 0 <= cx * cs < self.width and 0 <= cy * cs < self.height
+
+    def tile(self, x, y):
+        """
+        Tile (x, y), walls outside of the map.
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return TILE_WALL
+        cs = self.chunk_size
+        return self.chunk(x // cs, y // cs).cells[(y % cs) * cs + x % cs]
+
+    def tile_at(self, x, y):
+        return self.tile(math.floor(x / GRID_SCALE), math.floor(y / GRID_SCALE))
+
+    def window(self, x0, y0, width, height):
+        """
+        Tiles [y0, y0+height) x [x0, x0+width) as a (height, width) array, walls outside of the map.
+        """
+        cs = self.chunk_size
+        tiles = np.full((height, width), TILE_WALL, dtype=np.uint8)
+        self.pinned = {
+            (cx, cy)
+            for cy in range(y0 // cs, (y0 + height - 1) // cs + 1)
+            for cx in range(x0 // cs, (x0 + width - 1) // cs + 1)
+            if self.is_chunk_in_grid(cx, cy)
+        }
+        for cx, cy in self.pinned:
+            chunk = self.chunk(cx, cy)
+            chunk.last_active = self.clock
+            ## overlap of the chunk and the window, in map coordinates
+            ax, ay = max(cx * cs, x0), max(cy * cs, y0)
+            bx, by = min((cx + 1) * cs, x0 + width), min((cy + 1) * cs, y0 + height)
+            tiles[ay - y0:by - y0, ax - x0:bx - x0] = chunk.tiles[ay - cy * cs:by - cy * cs, ax - cx * cs:bx - cx * cs]
+        return tiles
+
+    @property
+    def walkable(self):
+        raise TypeError("chunked grids have no whole map arrays, use window()")
+
+    def adjacency_table(self):
+        raise TypeError("chunked grids have no whole map arrays, use window()")
+
+    def collision_field(self, size=PLAYER_SIZE):
+        raise TypeError("chunked grids have no whole map arrays, use window()")
+
+class WindowSimulation:
+    """
+    What a PathFindingMap needs from a simulation, for a window of a chunked map.
+    """
+    def __init__(self, grid):
+        self.grid = grid
+
+class ChunkedPathFindingMap:
+    """
+    Pathfinding maps over the chunks within PATH_RADIUS of the player's chunk, moved along with the player.
+    Inside, the maps are a plain PathFindingMap on a copy of those tiles. Enemies outside only steer towards the player.
+    """
+    def __init__(self, sim, mode='full', radius=PATH_RADIUS):
+        self.sim = sim
+        self.mode = mode
+        self.radius = radius
+
+        self.center = None
+        self.origin = (0, 0)
+        self.map = None
+
+    @property
+    def dijkstra(self):
+        return self.map.dijkstra if self.map else None
+
+    @property
+    def directions(self):
+        return self.map.directions if self.map else None
+
+    def move_window(self, center):
+        grid = self.sim.grid
+        cs = grid.chunk_size
+        size = (2 * self.radius + 1) * cs
+        self.center = center
+        self.origin = ((center[0] - self.radius) * cs, (center[1] - self.radius) * cs)
+
+        window = Grid(size, size, grid.window(*self.origin, size, size))
+        self.map = PathFindingMap(WindowSimulation(window), self.mode)
+
+    def window_costs(self):
+        """
+        Number of enemies on each tile of the window.
+        """
+        x0, y0 = self.origin
+        window = self.map.sim.grid
+        costs = [0] * window.width * window.height
+        for x, y in self.sim.enemy_manager.positions():
+            ind = window.index_at(x - x0 * GRID_SCALE, y - y0 * GRID_SCALE)
+            if ind is not None:
+                costs[ind] += 1
+        return costs
+
+    def compute(self, positions, costs=None):
+        """
+        `positions` are map tile coordinates, the window follows the first one.
+        """
+        cs = self.sim.grid.chunk_size
+        px, py = positions[0]
+        center = (int(px) // cs, int(py) // cs)
+        if center != self.center:
+            self.move_window(center)
+
+        x0, y0 = self.origin
+        self.map.compute([(px - x0, py - y0) for px, py in positions], costs if costs is not None else self.window_costs())
+
+    def close(self):
+        pass
+
+    def direction(self, i, rage_mode):
+        return self.direction_at(*self.sim.grid.toXY(i), rage_mode)
+
+    def direction_at(self, x, y, rage_mode):
+        x0, y0 = self.origin
+        return self.map.direction_at(x - x0, y - y0, rage_mode) if self.map else DIRECTION_VECS[NO_DIRECTION]
+
+    def direction_codes(self, x, y, rage_mode):
+        x0, y0 = self.origin
+        return self.map.direction_codes(x - x0, y - y0, rage_mode)
+
+    def distances(self, x, y):
+        if self.map is None:
+            return None
+        x0, y0 = self.origin
+        return self.map.distances(x - x0, y - y0)
+
+    def bounds(self):
+        """
+        The window clipped to the map. Its last row and column are chunk walls, they are left out
+        so the corners of the bounds are maze cells.
+        """
+        grid = self.sim.grid
+        window = self.map.sim.grid
+        x0, y0 = self.origin
+        return (max(x0, 0), max(y0, 0), min(x0 + window.width - 1, grid.width), min(y0 + window.height - 1, grid.height))
@@ -0,0 +1,56 @@
+import numpy as np
+
+from src.consts import *
+
+## field samples per tile side
+COLLISION_RESOLUTION = 8
+
+class CollisionField:
+    """
+    Where a square entity of side `size` overlaps a wall, sampled `resolution` times per tile side
+    over the padded grid (the map plus its border of walls).
+    blocked[Y, X] is True when one of the corners of an entity centered in sample (X, Y) lies on a wall:
+    the walls grown by half the entity on every side. With the half size a whole number of samples,
+    it gives the same answer as probing the four corners with Grid.tile_at.
+    """
+    def __init__(self, grid, size=PLAYER_SIZE, resolution=COLLISION_RESOLUTION):
+        self.size = size
+        self.resolution = resolution
+        self.step = GRID_SCALE / resolution
+        half = size / 2 / self.step
+        assert half == int(half), "half the entity size must be a whole number of samples"
+        half = int(half)
+
+        walls = np.repeat(np.repeat(grid.padded != TILE_EMPTY, resolution, axis=0), resolution, axis=1)
+        h, w = walls.shape
+        ys, xs = np.arange(h), np.arange(w)
+        self.blocked = np.zeros_like(walls)
+        for dy in (-half, half):
+            rows = walls[np.clip(ys + dy, 0, h - 1)]
+            for dx in (-half, half):
+                self.blocked |= rows[:, np.clip(xs + dx, 0, w - 1)]
+
+    def blocked_at(self, x, y):
+        """
+        Whether entities centered on the world positions (x, y) overlap a wall, positions outside of the map clamp into the border.
+        """
+        h, w = self.blocked.shape
+        X = np.clip(np.floor(x / self.step).astype(np.int64) + self.resolution, 0, w - 1)
+        Y = np.clip(np.floor(y / self.step).astype(np.int64) + self.resolution, 0, h - 1)
+        return self.blocked[Y, X]
+
+    def move_and_collide(self, pos, delta):
+        """
+        Entity.move_and_collide for (n, 2) arrays of positions and moves, returns the new positions as float64.
+        Each axis is moved in turn, an entity ending up in a wall is clamped inside the tile it started from, so it slides along walls.
+        """
+        half_size = self.size / 2
+        eps = 0.001
+
+        new = pos.astype(np.float64)
+        current_tile = np.trunc(new / GRID_SCALE) * GRID_SCALE
+        for axis in range(2):
+            new[:, axis] += delta[:, axis]
+            fix = self.blocked_at(new[:, 0], new[:, 1])
+            new[fix, axis] = np.clip(new[fix, axis], current_tile[fix, axis] + half_size + eps, current_tile[fix, axis] + GRID_SCALE - half_size - eps)
+        return new
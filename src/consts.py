@@ -11,6 +11,10 @@ TILE_WALL = 1
 PLAYER_SPEED = 15
 PLAYER_SIZE = 1
 
+## the step the per-step constants (turning, separation, camera smoothing) are tuned for,
+## they are scaled by the steps of it elapsed so every simulation rate plays the same game
+TUNING_DT = 1/60
+
 COLOR_DARK = (0, 0, 0)
 COLOR_BRIGHT = (120, 120, 120)
 COLOR_BRIGHT_2 = (200, 200, 200)
@@ -1,12 +1,29 @@
 from src.consts import *
+from src.profiler import Profiler
 
 game = None
+sim = None
 
 volume = VOLUME
 
 keyboard = 'qwerty' ## qwerty, azerty
 
+## game sessions, a fixed seed replays the same map and spawns
+seed = None
+map_size = (GRID_WIDTH, GRID_HEIGHT)
+chunked = False ## generate the map around the player instead of up front
+record_path = None ## where the inputs of the last session are recorded
+sim_rate = 60 ## simulation steps per second
+max_steps = 4 ## simulation steps per frame at most, the simulation slows down past that
+engine = 'object' ## enemy engine, see src/simulation.py
+engine_options = None ## broadphase and level of detail of the engine
+path_mode = 'full' ## pathfinding update mode, see src/dijsktra.py
+path_worker = None ## 'thread' or 'process' to compute the paths off the game loop, a thread by default in a window
+
+## frame timings, see src/profiler.py
+profiler = Profiler()
+
 ## shaders
 programs = {
     ''
-}
\ No newline at end of file
+}
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import numpy as np
+from arcade.gl import BufferDescription
+
+from src.decals import DecalLayer
+
+class DecalRenderer:
+    """
+    One texture and quad per chunk of a DecalLayer. Only the chunks stamped since the last frame are uploaded,
+    so the cost stays the same however many decals were stamped before.
+    """
+    def __init__(self, gl_ctx, layer: DecalLayer):
+        self.gl_ctx = gl_ctx
+        self.layer = layer
+        self.program = gl_ctx.program(
+            vertex_shader=Path('assets/shaders/decal.vs').read_text(),
+            fragment_shader=Path('assets/shaders/decal.fs').read_text()
+        )
+        self.program['tex'] = 0
+        self.chunks = {}
+
+    def chunk_geometry(self, key):
+        cx, cy = key
+        size = self.layer.chunk_size
+        x0, y0, x1, y1 = cx * size, cy * size, (cx + 1) * size, (cy + 1) * size
+        vertices = np.array([
+            x0, y0, 0, 0,  x1, y0, 1, 0,  x1, y1, 1, 1,
+            x0, y0, 0, 0,  x1, y1, 1, 1,  x0, y1, 0, 1,
+        ], dtype=np.float32)
+        buffer = self.gl_ctx.buffer(data=vertices.tobytes())
+        texture = self.gl_ctx.texture((self.layer.texels, self.layer.texels), components=4)
+        return texture, self.gl_ctx.geometry([BufferDescription(buffer, '2f 2f', ['in_vert', 'in_uv'])])
+
+    def upload(self):
+        for key in [key for key in self.chunks if key not in self.layer.chunks]:
+            del self.chunks[key]
+
+        for key in self.layer.take_dirty():
+            if key not in self.chunks:
+                self.chunks[key] = self.chunk_geometry(key)
+            texture, _ = self.chunks[key]
+            texture.write(self.layer.chunks[key].tobytes())
+
+    def draw(self):
+        self.upload()
+
+        ## the layer is premultiplied
+        blend_func = self.gl_ctx.blend_func
+        self.gl_ctx.blend_func = self.gl_ctx.ONE, self.gl_ctx.ONE_MINUS_SRC_ALPHA
+        for texture, geometry in self.chunks.values():
+            texture.use(0)
+            geometry.render(self.program)
+        self.gl_ctx.blend_func = blend_func
@@ -0,0 +1,100 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+from src.consts import *
+
+## decal texels per world unit
+DECAL_RESOLUTION = 8
+## world units per decal chunk side
+DECAL_CHUNK_SIZE = 16 * GRID_SCALE
+## decal chunks kept (1MB each), the ones stamped the longest ago are dropped first
+MAX_DECAL_CHUNKS = 64
+
+BLOOD_IMAGE = "assets/blood.png"
+BLOOD_SCALE = 0.002
+BLOOD_ANGLES = 24
+
+## the image is brought down to this many times the stamp size before being rotated
+SUPERSAMPLING = 4
+
+@lru_cache
+def make_stamps(path, scale, angles, resolution=DECAL_RESOLUTION):
+    """
+    The image rotated by `angles` evenly spaced angles, at `scale` world units per pixel,
+    as premultiplied float32 RGBA arrays with row 0 at the bottom.
+    """
+    image = Image.open(path).convert('RGBA')
+    factor = min(1, scale * resolution * SUPERSAMPLING)
+    image = image.resize((round(image.width * factor), round(image.height * factor)), Image.LANCZOS)
+    scale /= factor
+
+    stamps = []
+    for k in range(angles):
+        rotated = image.rotate(k * 360 / angles, resample=Image.BICUBIC, expand=True)
+        size = max(1, round(rotated.width * scale * resolution)), max(1, round(rotated.height * scale * resolution))
+        stamp = np.asarray(rotated.resize(size, Image.LANCZOS), dtype=np.float32)[::-1] / 255
+        stamp[..., :3] *= stamp[..., 3:]
+        stamps.append(stamp)
+    return stamps
+
+class DecalLayer:
+    """
+    Persistent layer of decals composited on the CPU, split into square chunks of (texels, texels, 4)
+    premultiplied RGBA uint8 arrays allocated the first time something is stamped on them.
+    `dirty` holds the chunks changed since the renderer last uploaded them.
+    """
+    def __init__(self, chunk_size=DECAL_CHUNK_SIZE, resolution=DECAL_RESOLUTION, max_chunks=MAX_DECAL_CHUNKS):
+        self.chunk_size = chunk_size
+        self.resolution = resolution
+        self.texels = chunk_size * resolution
+        self.max_chunks = max_chunks
+
+        self.chunks = {}
+        self.last_stamped = {}
+        self.dirty = set()
+        self.stamps_count = 0
+
+    def chunk(self, key):
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if len(self.chunks) >= self.max_chunks:
+                oldest = min(self.last_stamped, key=self.last_stamped.get)
+                del self.chunks[oldest]
+                del self.last_stamped[oldest]
+                self.dirty.discard(oldest)
+            chunk = self.chunks[key] = np.zeros((self.texels, self.texels, 4), dtype=np.uint8)
+        return chunk
+
+    def stamp(self, x, y, stamp):
+        """
+        Composites the premultiplied `stamp` centered on world position (x, y), "over" what is already there.
+        """
+        self.stamps_count += 1
+        h, w = stamp.shape[:2]
+        ## texel rectangle of the stamp in layer coordinates
+        tx0 = round(x * self.resolution - w / 2)
+        ty0 = round(y * self.resolution - h / 2)
+        tx1, ty1 = tx0 + w, ty0 + h
+
+        n = self.texels
+        for cy in range(math.floor(ty0 / n), math.floor((ty1 - 1) / n) + 1):
+            for cx in range(math.floor(tx0 / n), math.floor((tx1 - 1) / n) + 1):
+                ## overlap of the stamp and the chunk
+                ax, ay = max(tx0, cx * n), max(ty0, cy * n)
+                bx, by = min(tx1, (cx + 1) * n), min(ty1, (cy + 1) * n)
+
+                chunk = self.chunk((cx, cy))
+                dst = chunk[ay - cy * n:by - cy * n, ax - cx * n:bx - cx * n]
+                src = stamp[ay - ty0:by - ty0, ax - tx0:bx - tx0]
+                blended = src * 255 + dst * (1 - src[..., 3:])
+                dst[:] = np.clip(blended + 0.5, 0, 255).astype(np.uint8)
+
+                self.last_stamped[(cx, cy)] = self.stamps_count
+                self.dirty.add((cx, cy))
+
+    def take_dirty(self):
+        dirty, self.dirty = self.dirty, set()
+        return dirty
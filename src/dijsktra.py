@@ -1,60 +1,346 @@
 from heapq import heappop, heappush
-from math import hypot
+from types import SimpleNamespace
+import multiprocessing
+import threading
+
+import numpy as np
 
 from src.consts import *
 from src.vec import Vec2
-from src import ctx
+
+## direction codes are (dy+1)*3 + (dx+1), DIRECTION_VECS / DIRECTIONS map them to unit vectors
+NO_DIRECTION = 4
+DIRECTION_VECS = [Vec2(x, y) for y in (-1, 0, 1) for x in (-1, 0, 1)]
+for v in DIRECTION_VECS:
+    v.normalize()
+DIRECTIONS = np.array([(v.x, v.y) for v in DIRECTION_VECS], dtype=np.float32)
+
+INF = float('inf')
+
+## all pairs distance table
+UNREACHABLE = 0xFFFF
+BFS_BATCH = 256
+## the table takes up to 2*tiles² bytes and as long to fill: 32MiB and about 2s at this size
+PRECOMPUTED_MAX_TILES = 64 * 64
+## direction codes kept for the most recent player tiles
+DIRECTIONS_CACHE_SIZE = 256
+
+def congestion_costs(sim):
+    """
+    Number of enemies on each tile.
+    """
+    costs = [0] * sim.grid.width * sim.grid.height
+    for pos in sim.enemy_manager.positions():
+        ind = sim.grid.index_at(*pos)
+        if ind is not None:
+            costs[ind] += 1
+    return costs
 
 class PathFindingMap:
-    def __init__(self, game):
-        self.game = game
+    """
+    Distance map to the player (`dijkstra`) and the direction enemies follow on each tile (`directions`).
+    mode 'full' rebuilds both from scratch on every compute, 'incremental' rebuilds them when the player moves
+    and repairs them LPA* style when only the congestion costs changed: only the tiles whose distance changed
+    (and their neighbours' directions) are updated. The simulation refreshes the congestion of an 'incremental' map
+    every Simulation.congestion_interval ticks while the player stays on one tile, the case the repair is made for.
+    mode 'precomputed' runs a BFS from every walkable tile once, then the (congestion free) map
+    of any player tile is a table lookup.
+    """
+    MODES = ('full', 'incremental', 'precomputed')
+
+    def __init__(self, sim, mode='full'):
+        assert mode in self.MODES, f"unknown pathfinding mode {mode}"
+        self.sim = sim
+        self.mode = mode
 
         self.dijkstra = None
-        self.gradient = None
+        ## dijkstra as an int64 array when it is kept as a list, refreshed by computeGradient
+        self.distance_array = None
+        ## direction codes per tile, directions[0] when chasing the player and directions[1] when fleeing
+        self.directions = None
+
+        ## incremental state
+        self.g = None
+        self.rhs = None
+        self.costs = None
+        self.sources = set()
+        self.queue = []
+        self.neighbours = None
+
+        ## precomputed state
+        self.table = None
+        self.table_row = None
+        self.walls = None
+        self.cache = {}
+
+        if mode == 'precomputed':
+            assert sim.grid.width * sim.grid.height <= PRECOMPUTED_MAX_TILES, f"precomputed paths are limited to {PRECOMPUTED_MAX_TILES} tiles"
+            self.precompute_distances()
+
+    def compute(self, positions, costs=None):
+        """
+        Updates the maps towards `positions` (tile coordinates).
+        `costs` are the congestion costs per tile, computed from the enemies if None.
+        """
+        if self.mode == 'incremental':
+            dirty = self.compute_incremental(positions, costs)
+            self.computeGradient(dirty)
+        elif self.mode == 'precomputed':
+            self.compute_precomputed(positions)
+        else:
+            self.compute_dijsktra2(positions, costs)
+            self.computeGradient()
+
+    def close(self):
+        pass
+
+    def computeGradient(self, dirty=None):
+        """
+        Recomputes the chase and flee direction codes of the tiles in `dirty` and of their neighbours,
+        or of every tile if None.
+        """
+        grid = self.sim.grid
+        w, h = grid.width, grid.height
+
+        ## distances padded with a -1 border, so every tile has 4 neighbours
+        padded = np.full((h + 2, w + 2), -1, dtype=np.int64)
+        padded[1:-1, 1:-1] = np.asarray(self.dijkstra, dtype=np.int64).reshape(h, w)
+        self.distance_array = padded[1:-1, 1:-1].ravel()
+        padded = padded.ravel()
+
+        if dirty is None or self.directions is None:
+            self.directions = np.full((2, w * h), NO_DIRECTION, dtype=np.uint8)
+            indices = np.arange(w * h, dtype=np.int64)
+        else:
+            dirty = np.fromiter(dirty, dtype=np.int64, count=len(dirty))
+            x, y = dirty % w, dirty // w
+            indices = np.unique(np.concatenate([
+                (np.clip(y + gy, 0, h - 1)) * w + np.clip(x + gx, 0, w - 1)
+                for gx, gy in ((0, 0), (1, 0), (0, 1), (-1, 0), (0, -1))
+            ]))
+
+        x, y = indices % w, indices // w
+        p = (y + 1) * (w + 2) + (x + 1)
+        d = padded[p]
+
+        chase_x = np.zeros(len(p), dtype=np.int64)
+        chase_y = np.zeros(len(p), dtype=np.int64)
+        flee_x = np.zeros(len(p), dtype=np.int64)
+        flee_y = np.zeros(len(p), dtype=np.int64)
+        for gx, gy in ((1, 0), (0, 1), (-1, 0), (0, -1)):
+            other = padded[p + gy * (w + 2) + gx]
+            closer = (other >= 0) & (other < d)
+            further = (other >= 0) & (other > d)
+            chase_x += gx * closer
+            chase_y += gy * closer
+            flee_x -= gx * further
+            flee_y -= gy * further
+
+        walkable = d >= 0
+        self.directions[0, indices] = np.where(walkable, (chase_y + 1) * 3 + (chase_x + 1), NO_DIRECTION)
+        self.directions[1, indices] = np.where(walkable, (flee_y + 1) * 3 + (flee_x + 1), NO_DIRECTION)
+
+    def direction(self, i, rage_mode):
+        """
+        Unit direction enemies follow on tile `i`.
+        """
+        return DIRECTION_VECS[self.directions[int(rage_mode), i]]
+
+    def direction_at(self, x, y, rage_mode):
+        """
+        Unit direction on tile (x, y), zero outside of the map.
+        """
+        grid = self.sim.grid
+        if grid.isXYInGrid(x, y):
+            return self.direction(y * grid.width + x, rage_mode)
+        return DIRECTION_VECS[NO_DIRECTION]
+
+    def direction_codes(self, x, y, rage_mode):
+        """
+        Direction codes of the tiles (x[k], y[k]), NO_DIRECTION outside of the map.
+        """
+        grid = self.sim.grid
+        inside = (0 <= x) & (x < grid.width) & (0 <= y) & (y < grid.height)
+        codes = np.full(len(x), NO_DIRECTION, dtype=np.uint8)
+        codes[inside] = self.directions[int(rage_mode)][y[inside] * grid.width + x[inside]]
+        return codes
+
+    def distances(self, x, y):
+        """
+        Flow-field distances to the player of the tiles (x[k], y[k]), negative on walls, unreached tiles and outside of the map.
+        None before the first compute.
+        """
+        if self.dijkstra is None:
+            return None
+        grid = self.sim.grid
+        inside = (0 <= x) & (x < grid.width) & (0 <= y) & (y < grid.height)
+        distances = np.full(len(x), -1, dtype=np.int64)
+        dijkstra = self.dijkstra if isinstance(self.dijkstra, np.ndarray) else self.distance_array
+        distances[inside] = dijkstra[y[inside] * grid.width + x[inside]]
+        return distances
+
+    def bounds(self):
+        """
+        Tiles covered by the maps, (x0, y0, x1, y1) with x1 and y1 excluded.
+        """
+        return (0, 0, self.sim.grid.width, self.sim.grid.height)
+
+    def precompute_distances(self):
+        """
+        BFS from every walkable tile, `table[table_row[a], b]` is the distance between tiles a and b
+        (UNREACHABLE if there is no path). Sources are expanded BFS_BATCH at a time.
+        """
+        grid = self.sim.grid
+        w, h = grid.width, grid.height
+
+        walkable = grid.walkable
+        sources = np.flatnonzero(walkable)
+        walkable = walkable.reshape(h, w)
+
+        self.table = np.full((len(sources), w * h), UNREACHABLE, dtype=np.uint16)
+        self.table_row = np.full(w * h, -1, dtype=np.int64)
+        self.table_row[sources] = np.arange(len(sources))
+
+        for first in range(0, len(sources), BFS_BATCH):
+            batch = sources[first:first + BFS_BATCH]
+            dist = self.table[first:first + len(batch)].reshape(len(batch), h, w)
+
+            frontier = np.zeros((len(batch), h, w), dtype=bool)
+            frontier.reshape(len(batch), -1)[np.arange(len(batch)), batch] = True
+            visited = frontier.copy()
+
+            distance = 0
+            while frontier.any():
+                dist[frontier] = distance
+
+                reached = np.zeros_like(frontier)
+                reached[:, 1:, :] |= frontier[:, :-1, :]
+                reached[:, :-1, :] |= frontier[:, 1:, :]
+                reached[:, :, 1:] |= frontier[:, :, :-1]
+                reached[:, :, :-1] |= frontier[:, :, 1:]
+                reached &= walkable
+                reached &= ~visited
+
+                visited |= reached
+                frontier = reached
+                distance += 1
+
+        self.walls = ~walkable.ravel()
+
+    def compute_precomputed(self, positions):
+        grid = self.sim.grid
+        rows = tuple(sorted({
+            int(self.table_row[grid.toI(px, py)]) for px, py in positions
+            if grid.isXYInGrid(int(px), int(py)) and self.table_row[grid.toI(px, py)] >= 0
+        }))
+
+        if rows:
+            dist = self.table[list(rows)].min(axis=0).astype(np.int64)
+        else:
+            dist = np.full(grid.width * grid.height, UNREACHABLE, dtype=np.int64)
+        self.dijkstra = np.where(dist == UNREACHABLE, np.where(self.walls, -1, -2), dist)
+
+        if rows in self.cache:
+            self.directions = self.cache[rows]
+            return
 
-    def compute(self, positions):
-        self.compute_dijsktra2(positions)
         self.computeGradient()
+        if len(self.cache) >= DIRECTIONS_CACHE_SIZE:
+            self.cache.pop(next(iter(self.cache)))
+        self.cache[rows] = self.directions
+
+    def init_incremental(self):
+        grid = self.sim.grid
+        n = grid.width * grid.height
+
+        self.g = [INF] * n
+        self.rhs = [INF] * n
+        self.costs = [0] * n
+        self.cost_array = np.zeros(n, dtype=np.int64)
+        self.sources = set()
+        self.queue = []
+        self.dijkstra = self.empty_map()
+
+        ## the grid is static, walkable neighbours of every walkable tile
+        self.neighbours = grid.neighbour_lists()
+
+    def update_vertex(self, v):
+        if v in self.sources:
+            rhs = 0
+        else:
+            g, costs = self.g, self.costs
+            rhs = min([g[u] + 1 + costs[u] for u in self.neighbours[v]], default=INF)
+        self.rhs[v] = rhs
+
+        if self.g[v] != rhs:
+            heappush(self.queue, (min(self.g[v], rhs), v))
+
+    def compute_incremental(self, positions, costs=None):
+        """
+        Repairs the distance map after the congestion costs changed, returns the tiles whose distance changed.
+        A change of sources moves the whole map, repairing it costs several times a rebuild:
+        the map is rebuilt with compute_dijsktra2 instead, g and rhs reseeded from it, and None is returned.
+        """
+        grid = self.sim.grid
+        if self.g is None:
+            self.init_incremental()
+
+        sources = set()
+        for px, py in positions:
+            if grid.isXYInGrid(int(px), int(py)) and grid[grid.toI(px, py)] == TILE_EMPTY:
+                sources.add(grid.toI(px, py))
+
+        if costs is None:
+            costs = self.calc_costs()
+        cost_array = np.asarray(costs, dtype=np.int64)
+
+        if sources != self.sources:
+            self.compute_dijsktra2(positions, costs)
+            self.g = [INF if d < 0 else d for d in self.dijkstra]
+            self.rhs = list(self.g)
+            self.queue = []
+            self.sources = sources
+            self.costs = list(costs)
+            self.cost_array = cost_array
+            return None
+
+        changed = set()
+        for i in np.flatnonzero(cost_array != self.cost_array).tolist():
+            changed.update(self.neighbours[i])
+        self.costs = list(costs)
+        self.cost_array = cost_array
+
+        for v in changed:
+            self.update_vertex(v)
+
+        ## LPA* without heuristic, the whole map is wanted
+        dirty = set()
+        g, rhs, queue = self.g, self.rhs, self.queue
+        while queue:
+            key, v = heappop(queue)
+            if g[v] == rhs[v] or key != min(g[v], rhs[v]):
+                continue # stale entry
+
+            dirty.add(v)
+            if g[v] > rhs[v]:
+                g[v] = rhs[v]
+            else:
+                g[v] = INF
+                self.update_vertex(v)
 
-    def computeGradient(self):
-        gradient = [0] * GRID_WIDTH * GRID_HEIGHT
-
-        for i in range(GRID_WIDTH * GRID_HEIGHT):
-
-            if self.dijkstra[i] < 0:
-                gradient[i] = Vec2(0.0, 0.0)
-                continue
-
-            v = Vec2(0.0, 0.0)
-            x, y = self.game.grid.toXY(i)
-
-            # size = 1
-            # for gy in range(-size, size+1):
-            #     for gx in range(-size, size+1):
-            for gx, gy in ((1, 0), (0, 1), (-1, 0), (0, -1)):
-                if x == y == 0: continue
-                if not self.game.grid.isXYInGrid(x+gx, y+gy): continue
-
-                try:
-                    index = self.game.grid.toI(x+gx, y+gy)
-                    if ctx.game.enemy_manager.rage_mode:
-                        if self.dijkstra[index] >= 0 and self.dijkstra[index] > self.dijkstra[i]:
-                            v.x -= gx
-                            v.y -= gy
-                    else:
-                        if self.dijkstra[index] >= 0 and self.dijkstra[index] < self.dijkstra[i]:
-                            v.x += gx
-                            v.y += gy
-                except IndexError:
-                    pass
-
-            v.normalize()
-
-            gradient[i] = v
+            for s in self.neighbours[v]:
+                self.update_vertex(s)
 
-        self.gradient = gradient
+        for v in dirty:
+            self.dijkstra[v] = -2 if g[v] == INF else g[v]
 
+        return dirty
 
+    def empty_map(self):
+        """
+        -1 on walls and -2 (not reached) everywhere else.
+        """
+        return np.where(self.sim.grid.walkable, -2, -1).tolist()
 
     def computeDijsktra(self, px, py):
         #TODO: add error check
@@ -63,10 +349,12 @@ class PathFindingMap:
         # -2 : not checked
         # else: distance from (x, y)
 
-        dijkstra_map = [-2] * GRID_WIDTH * GRID_HEIGHT
+        grid = self.sim.grid
+        neighbours = grid.neighbour_lists()
+        dijkstra_map = self.empty_map()
 
         indices = []
-        nextIndices = [ (int(py) * GRID_WIDTH + int(px)) ]
+        nextIndices = [grid.toI(px, py)] if grid.isXYInGrid(int(px), int(py)) and grid[grid.toI(px, py)] == TILE_EMPTY else []
 
         distance = 0
 
@@ -75,72 +363,157 @@ class PathFindingMap:
             nextIndices = []
 
             for index in indices:
-
-                if not self.game.grid.isIndexInGrid(index): continue
                 if dijkstra_map[index] != -2: continue
 
-                if self.game.grid[index] == TILE_EMPTY:
-                    dijkstra_map[index] = distance
-
-                    x, y = self.game.grid.toXY(index)
-                    for nx, ny in ((1, 0), (0, 1), (-1, 0), (0, -1)):
-                        if not self.game.grid.isXYInGrid(x+nx, y+ny): continue
-
-                        neighbour_index = self.game.grid.toI(x + nx, y + ny)
-                        nextIndices.append(neighbour_index)
-
-                elif self.game.grid[index] == TILE_WALL:
-                    dijkstra_map[index] = -1
-
-                else:
-                    pass
+                dijkstra_map[index] = distance
+                nextIndices.extend(neighbours[index])
 
             distance += 1
 
         self.dijkstra = dijkstra_map
 
     def calc_costs(self):
-        costs = [0] * GRID_WIDTH * GRID_HEIGHT
-        for enemy in ctx.game.enemy_manager.enemies:
-            ind = ctx.game.grid.index_at(*enemy.pos)
-            if ind is not None:
-                costs[ind] += 1
-        return costs
-
-    def compute_dijsktra2(self, positions):
+        return congestion_costs(self.sim)
+
+    def compute_dijsktra2(self, positions, costs=None):
         #TODO: add error check
 
         # -1 : Wall
         # -2 : not checked
         # else: distance from (x, y)
 
-        dijkstra_map = [-2] * GRID_WIDTH * GRID_HEIGHT
-        costs = self.calc_costs()
-        indices = [(0, (int(py) * GRID_WIDTH + int(px))) for (px, py) in positions]
+        grid = self.sim.grid
+        neighbours = grid.neighbour_lists()
 
-        distance = 0
+        dijkstra_map = self.empty_map()
+        if costs is None:
+            costs = self.calc_costs()
+        indices = [(0, grid.toI(px, py)) for (px, py) in positions if grid.isXYInGrid(int(px), int(py)) and grid[grid.toI(px, py)] == TILE_EMPTY]
 
         while len(indices) > 0:
             distance, index = heappop(indices)
-
-            if not self.game.grid.isIndexInGrid(index): continue
             if dijkstra_map[index] != -2: continue
 
-            if self.game.grid[index] == TILE_EMPTY:
-                x, y = self.game.grid.toXY(index)
-                dijkstra_map[index] = distance
-
-                for nx, ny in ((1, 0), (0, 1), (-1, 0), (0, -1)):
-                    if not self.game.grid.isXYInGrid(x+nx, y+ny): continue
-
-                    neighbour_index = self.game.grid.toI(x + nx, y + ny)
-                    new_cost = distance + 1 + costs[index]
+            dijkstra_map[index] = distance
+            new_cost = distance + 1 + costs[index]
+            for neighbour_index in neighbours[index]:
+                if dijkstra_map[neighbour_index] == -2:
                     heappush(indices, (new_cost, neighbour_index))
 
-            elif self.game.grid[index] == TILE_WALL:
-                dijkstra_map[index] = -1
+        self.dijkstra = dijkstra_map
 
+def path_worker(conn, grid, mode):
+    """
+    Entry point of the pathfinding process, computes the requests received on `conn` on its own copy of the grid.
+    """
+    worker_map = PathFindingMap(SimpleNamespace(grid=grid), mode)
+    while True:
+        request = conn.recv()
+        if request is None:
+            return
+        positions, costs = request
+        worker_map.compute(positions, costs)
+        conn.send((np.array(worker_map.dijkstra), worker_map.directions))
+
+class AsyncPathFindingMap:
+    """
+    Runs a PathFindingMap on a worker. compute() only queues the request (the latest one wins)
+    and enemies keep steering on the last published maps until the worker swaps the new ones in.
+    Congestion costs are snapshot on the calling thread, the worker never reads the enemies.
+    With worker='process' the maps are computed in a child process, so they don't compete for the GIL.
+    """
+    WORKERS = ('thread', 'process')
+
+    def __init__(self, sim, mode='full', worker='thread'):
+        assert worker in self.WORKERS, f"unknown pathfinding worker {worker}"
+        self.sim = sim
+        self.mode = mode
+
+        self.worker_map = None
+        self.process = None
+        if worker == 'process':
+            self.conn, child_conn = multiprocessing.Pipe()
+            self.process = multiprocessing.Process(target=path_worker, args=(child_conn, sim.grid, mode), daemon=True)
+            self.process.start()
+        else:
+            self.worker_map = PathFindingMap(sim, mode)
+
+        ## (dijkstra, directions), replaced as a whole so readers never see a half updated pair
+        self.published = (None, None)
+
+        self.condition = threading.Condition()
+        self.request = None
+        self.requested = 0
+        self.completed = 0
+        self.running = True
+
+        self.thread = threading.Thread(target=self.run, name="pathfinding", daemon=True)
+        self.thread.start()
+
+    @property
+    def dijkstra(self):
+        return self.published[0]
+
+    @property
+    def directions(self):
+        return self.published[1]
+
+    def direction(self, i, rage_mode):
+        return DIRECTION_VECS[self.directions[int(rage_mode), i]]
+
+    direction_at = PathFindingMap.direction_at
+    direction_codes = PathFindingMap.direction_codes
+    distances = PathFindingMap.distances
+    bounds = PathFindingMap.bounds
+
+    def compute(self, positions, costs=None):
+        if costs is None and self.mode != 'precomputed':
+            costs = congestion_costs(self.sim)
+
+        with self.condition:
+            self.request = (list(positions), costs)
+            self.requested += 1
+            self.condition.notify()
+
+        ## nothing to steer on yet
+        if self.directions is None:
+            self.wait()
+
+    def wait(self):
+        """
+        Blocks until every queued request has been published.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.completed == self.requested)
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.request is not None or not self.running)
+                if not self.running:
+                    return
+                request = self.request
+                requested = self.requested
+                self.request = None
+
+            if self.process is not None:
+                self.conn.send(request)
+                self.published = self.conn.recv()
             else:
-                pass
-
-        self.dijkstra = dijkstra_map
+                self.worker_map.compute(*request)
+                ## the worker map may update its arrays in place, publish copies
+                self.published = (np.array(self.worker_map.dijkstra), self.worker_map.directions.copy())
+
+            with self.condition:
+                self.completed = requested
+                self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join()
+
+        if self.process is not None:
+            self.conn.send(None)
+            self.process.join()
@@ -1,16 +1,12 @@
 import math
-from dataclasses import dataclass
-import random
-from numpy import mat
 
-import pyglet
-import arcade
+import numpy as np
 
 from src import ctx
 from src.consts import *
 from src.vec import Vec2
 from src.player import Entity
-from src.utils import clamp
+from src.lod import lod_periods, lod_due
 
 SPAWN_DELAY = 0.5
 ENEMY_SPEED = 14
@@ -21,31 +17,127 @@ TURNING_WEIGHT = 0.03
 ## acceleration structure
 CELL_SIZE = PLAYER_SIZE
 
-# @dataclass
 class Enemy(Entity):
-    def __init__(self, pos, batch):
-        super().__init__()
+    """
+    Slotted record, reused by EnemyManager for the next spawn once the enemy is dead.
+    """
+    __slots__ = ("pos", "prev_pos", "vel", "acc", "dead", "hash", "phase", "idle", "slot")
 
+    def __init__(self, pos=None):
+        self.reset(pos if pos is not None else Vec2(0, 0))
+
+    def reset(self, pos):
         self.pos: Vec2 = pos
+        self.prev_pos: Vec2 = pos
         self.vel: Vec2 = Vec2(0, 0)
         self.acc = Vec2(0, 0)
         self.dead: bool = False
         self.hash: int = 0
-        self.shape = pyglet.shapes.Rectangle(self.pos.x, self.pos.y, PLAYER_SIZE, PLAYER_SIZE, color=arcade.color.CRIMSON, batch=batch)
+        ## level of detail: spawn order, and time since the last update
+        self.phase: int = 0
+        self.idle: float = 0.0
+        ## index in EnemyManager.enemies
+        self.slot: int = 0
 
 class EnemyManager:
-    def __init__(self):
+    """
+    Enemies as a list of Enemy objects, the reference implementation.
+    The records come from a pool of `capacity` preallocated ones, dead enemies go back to its free list
+    and are swapped with the last one of `enemies`, so spawning and killing allocate nothing in the steady state.
+    With `lod_bands` (see src/lod.py) enemies far from the player along the paths update less often.
+    """
+    def __init__(self, lod_bands=None, capacity=256):
         self.enemies = []
+        self.free = [Enemy() for _ in range(capacity)]
+        ## enemies killed this tick, removed at the end of it
+        self.killed = []
+        self.lod_bands = lod_bands
+        self.spawned = 0
+        ## enemy updates run so far, lower than ticks * enemies with level of detail
+        self.updates = 0
         self.until_spawn = -5
         self.until_rage = RAGE_DELAY
         self.rage_mode = False
 
-        self.batch = pyglet.graphics.Batch()
-
         ## acceleration structure
         self.bucket = []
         self.count = []
 
+        ## enemies touching the player this tick, resolved after movement
+        self.contacts = []
+
+    def __len__(self):
+        return len(self.enemies)
+
+    def positions(self):
+        return (enemy.pos for enemy in self.enemies)
+
+    def store_previous(self):
+        """
+        Keeps the positions before a step, Entity.move_and_collide replaces pos rather than modifying it.
+        """
+        for enemy in self.enemies:
+            enemy.prev_pos = enemy.pos
+
+    def render_arrays(self, alpha=1.0):
+        """
+        (n, 2) float32 arrays of the positions and accelerations, for the renderer.
+        `alpha` interpolates between the positions before and after the last step.
+        """
+        data = np.array([(enemy.prev_pos.x, enemy.prev_pos.y, enemy.pos.x, enemy.pos.y, enemy.acc.x, enemy.acc.y) for enemy in self.enemies], dtype=np.float32).reshape(-1, 6)
+        return data[:, :2] + (data[:, 2:4] - data[:, :2]) * alpha, data[:, 4:]
+
+    def spawn(self, pos):
+        ## past the capacity the pool grows by one record at a time
+        enemy = self.free.pop() if self.free else Enemy()
+        enemy.reset(pos)
+        enemy.phase = self.spawned
+        enemy.slot = len(self.enemies)
+        self.spawned += 1
+        self.enemies.append(enemy)
+
+    def lod_distances(self, pos):
+        """
+        Flow-field distances of the enemies at the (n, 2) world positions `pos`, None if there are none yet.
+        """
+        tiles = (pos / GRID_SCALE).astype(np.int64)
+        return ctx.sim.pathFindingMap.distances(tiles[:, 0], tiles[:, 1])
+
+    def scheduled(self, dt):
+        """
+        (enemy, elapsed time) of the enemies updating this tick. Without level of detail every enemy, with dt.
+        """
+        distances = None
+        if self.lod_bands and self.enemies:
+            distances = self.lod_distances(np.array([(enemy.pos.x, enemy.pos.y) for enemy in self.enemies]))
+        if distances is None:
+            self.updates += len(self.enemies)
+            for enemy in self.enemies:
+                yield enemy, dt
+            return
+
+        periods = lod_periods(distances, self.lod_bands)
+        due = lod_due(periods, np.array([enemy.phase for enemy in self.enemies]), ctx.sim.tick).tolist()
+        for enemy, enemy_due in zip(self.enemies, due):
+            enemy.idle += dt
+            if enemy_due:
+                self.updates += 1
+                elapsed, enemy.idle = enemy.idle, 0.0
+                yield enemy, elapsed
+
+    def remove_dead(self):
+        """
+        Swaps each enemy killed this tick with the last one, then returns its record to the pool.
+        """
+        enemies = self.enemies
+        for enemy in self.killed:
+            last = enemies.pop()
+            if last is not enemy:
+                enemies[enemy.slot] = last
+                last.slot = enemy.slot
+            self.free.append(enemy)
+        self.killed = []
+
     def cellCoord(self, x, y, size):
         return ( math.floor(x / size), math.floor(y/size) )
 
@@ -74,34 +166,58 @@ class EnemyManager:
             self.bucket[ self.count[enemy.hash] ] = enemy
 
     def on_collision(self, enemy, player):
-        if self.rage_mode:
+        self.contacts.append(enemy)
+
+    def kill(self, contacts):
+        """
+        Marks the `contacts` dead, returns their positions.
+        """
+        for enemy in contacts:
             enemy.dead = True
-            ctx.game.score += SCORE_KILL
-            if ctx.game.alloc_sound():
-                arcade.play_sound(random.choice(SOUNDS_KILL), volume=ctx.volume)
-            ctx.game.blood_splashes.append(enemy.pos)
+        self.killed.extend(contacts)
+        return [enemy.pos for enemy in contacts]
+
+    def resolve_contacts(self):
+        """
+        Side effects of the contacts of this tick, in one pass: in rage mode the enemies die,
+        with the score, blood and a single sound for all of them, otherwise the game is over.
+        """
+        if len(self.contacts) == 0:
+            return
+        if self.rage_mode:
+            positions = self.kill(self.contacts)
+            ctx.sim.score += SCORE_KILL * len(positions)
+            if ctx.sim.alloc_sound():
+                ctx.sim.sounds.append(ctx.sim.rng.choice(SOUNDS_KILL))
+            ctx.sim.blood_splashes.extend(positions)
         else:
-            ctx.game.end_game()
+            ctx.sim.end_game()
+        self.contacts = []
 
     def update(self, dt):
         if not self.rage_mode:
             self.until_spawn -= dt
         if self.until_spawn < 0:
             self.until_spawn += SPAWN_DELAY
-            pos = random.choice([Vec2(x, y) for x in (2, (GRID_WIDTH-0.5) * GRID_SCALE) for y in (2, (GRID_HEIGHT-0.5) * GRID_SCALE)])
-            self.enemies.append(Enemy(pos, self.batch)) # TODO select a better location
+            x0, y0, x1, y1 = ctx.sim.pathFindingMap.bounds()
+            pos = ctx.sim.rng.choice([Vec2(x, y) for x in (x0*GRID_SCALE + 2, (x1-0.5) * GRID_SCALE) for y in (y0*GRID_SCALE + 2, (y1-0.5) * GRID_SCALE)])
+            self.spawn(pos) # TODO select a better location
         self.until_rage -= dt
         if self.until_rage < 0:
             self.until_rage += RAGE_DELAY
             self.rage_mode = not self.rage_mode
-            ctx.game.player.recompute_paths()
 
         self.computeAccelerationStructure()
 
         self.update_movement(dt)
-        self.enemies[:] = [enemy for enemy in self.enemies if not enemy.dead]
-
-    def compute_self_collision(self, me):
+        with ctx.profiler.section('contacts'):
+            self.resolve_contacts()
+        self.remove_dead()
+
+    def compute_self_collision(self, me, scale=1.0):
+        """
+        Pushes `me` away from the enemies closer than their size, `scale` times the push of one tuning step.
+        """
         n = len(self.enemies)
 
         for y in (-1, 0, 1):
@@ -122,22 +238,19 @@ class EnemyManager:
 
                     l = d.len()
                     if 0.0 < l < PLAYER_SIZE:
-                        me.vel -= d.normalized() * (1.0/ (l*10.0) ) ## i tried something, not too bad
+                        me.vel -= d.normalized() * (scale / (l*10.0) ) ## i tried something, not too bad
 
 
     def update_movement(self, dt):
-        player = ctx.game.player
-        for enemy in self.enemies:
+        player = ctx.sim.player
+        for enemy, dt in self.scheduled(dt):
             delta = player.pos - enemy.pos
             ln = delta.normalize()
 
             enemy_grid_x = int(enemy.pos.x / GRID_SCALE)
             enemy_grid_y = int(enemy.pos.y / GRID_SCALE)
 
-            pathFindDir = Vec2(0.0, 0.0)
-
-            if ctx.game.grid.isXYInGrid(enemy_grid_x, enemy_grid_y):
-                pathFindDir = ctx.game.pathFindingMap.gradient[enemy_grid_y * GRID_WIDTH + enemy_grid_x]
+            pathFindDir = ctx.sim.pathFindingMap.direction_at(enemy_grid_x, enemy_grid_y, self.rage_mode)
 
             if self.rage_mode:
                 delta *= -1
@@ -150,31 +263,17 @@ class EnemyManager:
                 else:
                     direction *= -0.2
 
+            ## tuning steps since the last update, more than one with level of detail or below 60 steps per second
+            steps = dt / TUNING_DT
             prev_vel = enemy.vel.copy()
-            enemy.vel += direction * TURNING_WEIGHT
+            enemy.vel += direction * (TURNING_WEIGHT * steps)
             enemy.vel = enemy.vel.clamped(MAX_VEL)
-            a = 0.9
+            a = 0.9 ** steps
             enemy.acc = enemy.acc * a + (enemy.vel-prev_vel) / dt * (1-a)
 
-            self.compute_self_collision(enemy)
+            self.compute_self_collision(enemy, steps)
 
             enemy.move_and_collide(enemy.vel * ENEMY_SPEED * dt)
 
             if ln < PLAYER_SIZE:
                 self.on_collision(enemy, player)
-
-    def draw(self):
-        for enemy in self.enemies:
-            enemy.shape.x = enemy.pos.x - PLAYER_SIZE/2
-            enemy.shape.y = enemy.pos.y - PLAYER_SIZE/2
-
-            if ENABLE_STRETCH:
-                mod = 0.1
-                vec = enemy.acc
-                cl = 0.25
-                v = clamp(((abs(vec.x) - abs(vec.y)) * mod), -cl, cl)
-                enemy.shape.width = PLAYER_SIZE * (1 + v)
-                enemy.shape.height = PLAYER_SIZE * (1 - v)
-
-        with arcade.get_window().ctx.pyglet_rendering():
-            self.batch.draw()
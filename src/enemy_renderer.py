@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import numpy as np
+import arcade
+from arcade.gl import BufferDescription
+
+from src.consts import *
+from src.map_mesh import QUAD_CORNERS
+
+STRETCH_FACTOR = 0.1
+MAX_STRETCH = 0.25
+
+def enemy_vertices(pos, acc, stretch=False):
+    """
+    Triangle vertices (x, y) of the enemy quads, six per enemy, from (n, 2) positions and accelerations.
+    A quad starts half a size below and left of its enemy. With `stretch` it widens with the
+    horizontal acceleration and gets taller with the vertical one, keeping its bottom left corner.
+    """
+    n = len(pos)
+    size = np.full((n, 2), PLAYER_SIZE, dtype=np.float32)
+    if stretch:
+        v = np.clip((np.abs(acc[:, 0]) - np.abs(acc[:, 1])) * STRETCH_FACTOR, -MAX_STRETCH, MAX_STRETCH)
+        size[:, 0] *= 1 + v
+        size[:, 1] *= 1 - v
+
+    corner = pos - PLAYER_SIZE/2
+    return (corner[:, None, :] + QUAD_CORNERS[None, :, :] * size[:, None, :]).astype(np.float32).reshape(-1, 2)
+
+class EnemyRenderer:
+    """
+    Draws every enemy from one vertex buffer, refilled from the enemy arrays and uploaded in one write per frame.
+    The simulation itself knows nothing about rendering.
+    """
+    def __init__(self, gl_ctx, capacity=256):
+        self.gl_ctx = gl_ctx
+        self.program = gl_ctx.program(
+            vertex_shader=Path('assets/shaders/map.vs').read_text(),
+            fragment_shader=Path('assets/shaders/map.fs').read_text()
+        )
+        self.program['color'] = tuple(c / 255 for c in arcade.color.CRIMSON[:3])
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        self.capacity = capacity
+        self.buffer = self.gl_ctx.buffer(reserve=capacity * len(QUAD_CORNERS) * 2 * 4)
+        self.geometry = self.gl_ctx.geometry([BufferDescription(self.buffer, '2f', ['in_vert'])])
+
+    def draw(self, enemy_manager, alpha=1.0):
+        pos, acc = enemy_manager.render_arrays(alpha)
+        n = len(pos)
+        if n == 0:
+            return
+        if n > self.capacity:
+            self.allocate(max(n, self.capacity * 2))
+
+        vertices = enemy_vertices(pos, acc, ENABLE_STRETCH)
+        self.buffer.write(vertices.tobytes())
+        self.geometry.render(self.program, vertices=len(vertices))
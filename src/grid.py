@@ -1,17 +1,111 @@
-from typing import List
+import math
+
+import numpy as np
+
 from src.consts import *
+from src.collision import CollisionField
 
 class Grid:
+    """
+    Tiles stored one byte each in a bytearray padded with a border of walls,
+    tile i = y*width + x lives at cells[i + 2*y + width + 3].
+    `tiles` and `walkable` are numpy views of the unpadded map, `adjacency_start`/`adjacency`
+    a CSR table of the walkable neighbours of every tile, rebuilt lazily after the grid changes
+    like the collision fields.
+    """
     def __init__(self, width, height, data=None):
         self.width = width
         self.height = height
-        self.grid: List[int] = data
+
+        self.cells = bytearray([TILE_WALL]) * ((width + 2) * (height + 2))
+        self.make_views()
+        if data is not None:
+            self.tiles[:] = np.asarray(data, dtype=np.uint8).reshape(height, width)
+
+    def make_views(self):
+        self.padded = np.frombuffer(self.cells, dtype=np.uint8).reshape(self.height + 2, self.width + 2)
+        self.tiles = self.padded[1:-1, 1:-1]
+        self._adjacency = None
+        self._neighbour_lists = None
+        self._collision_fields = {}
+
+    def __getstate__(self):
+        return (self.width, self.height, self.cells)
+
+    def __setstate__(self, state):
+        self.width, self.height, self.cells = state
+        self.make_views()
 
     def __getitem__(self, index):
-        return self.grid[index]
+        return self.cells[index + 2 * (index // self.width) + self.width + 3]
 
     def __setitem__(self, index, value):
-        self.grid[index] = value
+        self.cells[index + 2 * (index // self.width) + self.width + 3] = value
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Drops the tables derived from the tiles, to call after writing to `tiles` directly.
+        """
+        self._adjacency = None
+        self._neighbour_lists = None
+        self._collision_fields = {}
+
+    @property
+    def walkable(self):
+        return (self.tiles == TILE_EMPTY).ravel()
+
+    @property
+    def adjacency_start(self):
+        return self.adjacency_table()[0]
+
+    @property
+    def adjacency(self):
+        return self.adjacency_table()[1]
+
+    def adjacency_table(self):
+        """
+        Walkable neighbours of tile i are adjacency[adjacency_start[i]:adjacency_start[i+1]],
+        walls have none.
+        """
+        if self._adjacency is None:
+            w, h = self.width, self.height
+            walkable = self.padded == TILE_EMPTY
+            center = walkable[1:-1, 1:-1]
+            index = np.arange(w * h, dtype=np.int32).reshape(h, w)
+
+            ## (tile, neighbour) for the 4 directions, in the same order as the pathfinding loops
+            pairs = []
+            for nx, ny in ((1, 0), (0, 1), (-1, 0), (0, -1)):
+                linked = center & walkable[1+ny:h+1+ny, 1+nx:w+1+nx]
+                pairs.append(np.stack((index[linked], index[linked] + ny * w + nx), axis=1))
+            pairs = np.concatenate(pairs)
+            pairs = pairs[np.argsort(pairs[:, 0], kind='stable')]
+
+            start = np.zeros(w * h + 1, dtype=np.int32)
+            np.cumsum(np.bincount(pairs[:, 0], minlength=w * h), out=start[1:])
+            self._adjacency = (start, pairs[:, 1].copy())
+
+        return self._adjacency
+
+    def neighbour_lists(self):
+        """
+        The CSR table as python lists, faster to iterate from python loops.
+        """
+        if self._neighbour_lists is None:
+            start, adjacency = self.adjacency_table()
+            start, adjacency = start.tolist(), adjacency.tolist()
+            self._neighbour_lists = [adjacency[start[i]:start[i + 1]] for i in range(self.width * self.height)]
+        return self._neighbour_lists
+
+    def collision_field(self, size=PLAYER_SIZE):
+        """
+        CollisionField of entities of side `size` on this grid.
+        """
+        field = self._collision_fields.get(size)
+        if field is None:
+            field = self._collision_fields[size] = CollisionField(self, size)
+        return field
 
     def tile_quantize(self, x, y):
         return (int(x / GRID_SCALE) * GRID_SCALE, int(y / GRID_SCALE) * GRID_SCALE)
@@ -24,12 +118,13 @@ class Grid:
         return None
 
     def tile_at(self, x, y):
-        x /= GRID_SCALE
-        y /= GRID_SCALE
-        if 0 <= x < self.width and 0 <= y < self.height:
-            return self.grid[int(y) * self.width + int(x)]
-        else:
-            return TILE_WALL
+        """
+        Tile under world position (x, y), walls outside of the map.
+        Coordinates are clamped into the wall border instead of bounds checked.
+        """
+        x = min(max(math.floor(x / GRID_SCALE) + 1, 0), self.width + 1)
+        y = min(max(math.floor(y / GRID_SCALE) + 1, 0), self.height + 1)
+        return self.cells[y * (self.width + 2) + x]
 
     def isIndexInGrid(self, i):
         return 0 <= i < self.width * self.height
@@ -0,0 +1,21 @@
+import numpy as np
+
+## (flow-field distance in tiles, ticks between updates), sorted by distance: enemies at least that far
+## from the player along the paths update that rarely. Enemies with no distance get the last band.
+LOD_BANDS = ((12, 2), (24, 4), (48, 8))
+
+def lod_periods(distances, bands):
+    """
+    Ticks between two updates of enemies at `distances` (PathFindingMap.distances).
+    """
+    periods = np.ones(len(distances), dtype=np.int64)
+    for distance, ticks in bands:
+        periods[(distances >= distance) | (distances < 0)] = ticks
+    return periods
+
+def lod_due(periods, phases, tick):
+    """
+    Which enemies update on `tick`. Their `phases` (spawn order) spread the ones sharing a period
+    round robin over its ticks, so every tick updates about the same number of them.
+    """
+    return (phases + tick) % periods == 0
@@ -0,0 +1,59 @@
+import numpy as np
+
+from src.consts import *
+
+## two triangles per rectangle, corners as (dx, dy) fractions of its size
+QUAD_CORNERS = np.array([(0, 0), (1, 0), (1, 1), (0, 0), (1, 1), (0, 1)], dtype=np.float32)
+
+def greedy_rectangles(mask):
+    """
+    Covers the True cells of a 2d `mask` with non overlapping rectangles, returned as (x, y, width, height) rows.
+    Rows are scanned bottom up, every run of cells still uncovered starts a rectangle grown upwards
+    as long as the rows above are uncovered over its whole width.
+    """
+    h, w = mask.shape
+    remaining = mask.astype(bool)
+    rects = []
+    for y in range(h):
+        row = np.concatenate(([False], remaining[y], [False]))
+        edges = np.flatnonzero(row[1:] != row[:-1])
+        for x, end in zip(edges[0::2].tolist(), edges[1::2].tolist()):
+            top = y + 1
+            while top < h and remaining[top, x:end].all():
+                top += 1
+            remaining[y:top, x:end] = False
+            rects.append((x, y, end - x, top - y))
+    return np.array(rects, dtype=np.int32).reshape(-1, 4)
+
+def rectangles_vertices(rects, x0=0, y0=0, scale=GRID_SCALE):
+    """
+    Triangle vertices (x, y) of tile rectangles, in world coordinates.
+    """
+    origin = (rects[:, :2] + (x0, y0)) * scale
+    size = rects[:, 2:] * scale
+    return (origin[:, None, :] + QUAD_CORNERS[None, :, :] * size[:, None, :]).astype(np.float32).reshape(-1, 2)
+
+def coverage(rects, shape):
+    """
+    How many rectangles cover each cell, to check a mesh against its tiles.
+    """
+    covered = np.zeros(shape, dtype=np.int32)
+    for x, y, w, h in rects.tolist():
+        covered[y:y+h, x:x+w] += 1
+    return covered
+
+class MapMesh:
+    """
+    Static geometry of a block of tiles whose bottom left tile is (x0, y0): floor then wall rectangles,
+    as triangles in a single (n, 2) float32 vertex array. Colours are not part of it, they are chosen when drawing.
+    """
+    def __init__(self, tiles, x0=0, y0=0):
+        self.floor_rects = greedy_rectangles(tiles == TILE_EMPTY)
+        self.wall_rects = greedy_rectangles(tiles == TILE_WALL)
+
+        self.vertices = np.concatenate((
+            rectangles_vertices(self.floor_rects, x0, y0),
+            rectangles_vertices(self.wall_rects, x0, y0),
+        ))
+        self.floor_vertices = len(self.floor_rects) * len(QUAD_CORNERS)
+        self.wall_vertices = len(self.wall_rects) * len(QUAD_CORNERS)
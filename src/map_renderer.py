@@ -0,0 +1,84 @@
+from pathlib import Path
+
+from arcade.gl import BufferDescription
+
+from src.consts import *
+from src.chunks import ChunkedGrid
+from src.map_mesh import MapMesh
+
+def normalized(color):
+    return tuple(c / 255 for c in color[:3])
+
+## (floor, wall) colours, normal and rage mode
+COLORS = (
+    (normalized(COLOR_BRIGHT_2), normalized(COLOR_DARK)),
+    (normalized(COLOR_DARK), normalized(COLOR_BRIGHT_2)),
+)
+
+class MeshGeometry:
+    """
+    A MapMesh uploaded to the GPU, floor and walls share its vertex buffer.
+    """
+    def __init__(self, gl_ctx, mesh):
+        self.mesh = mesh
+        self.buffer = gl_ctx.buffer(data=mesh.vertices.tobytes())
+        self.geometry = gl_ctx.geometry([BufferDescription(self.buffer, '2f', ['in_vert'])])
+
+    def draw_floor(self, program):
+        if self.mesh.floor_vertices:
+            self.geometry.render(program, first=0, vertices=self.mesh.floor_vertices)
+
+    def draw_walls(self, program):
+        if self.mesh.wall_vertices:
+            self.geometry.render(program, first=self.mesh.floor_vertices, vertices=self.mesh.wall_vertices)
+
+class MapRenderer:
+    """
+    Map geometry, one greedy mesh for a whole Grid. On a ChunkedGrid every chunk gets its own mesh
+    the first time it is on screen, dropped when the chunk is evicted.
+    """
+    def __init__(self, gl_ctx, grid):
+        self.gl_ctx = gl_ctx
+        self.grid = grid
+        self.program = gl_ctx.program(
+            vertex_shader=Path('assets/shaders/map.vs').read_text(),
+            fragment_shader=Path('assets/shaders/map.fs').read_text()
+        )
+
+        self.meshes = {}
+        if not isinstance(grid, ChunkedGrid):
+            self.meshes[(0, 0)] = MeshGeometry(gl_ctx, MapMesh(grid.tiles))
+
+    def visible(self, left, right, bottom, top):
+        """
+        Meshes overlapping the world rectangle [left, right] x [bottom, top].
+        """
+        grid = self.grid
+        if not isinstance(grid, ChunkedGrid):
+            return list(self.meshes.values())
+
+        for key in [key for key in self.meshes if key not in grid.chunks]:
+            del self.meshes[key]
+
+        size = grid.chunk_size * GRID_SCALE
+        visible = []
+        for cy in range(int(bottom // size), int(top // size) + 1):
+            for cx in range(int(left // size), int(right // size) + 1):
+                if not grid.is_chunk_in_grid(cx, cy):
+                    continue
+                mesh = self.meshes.get((cx, cy))
+                if mesh is None:
+                    chunk = grid.chunk(cx, cy)
+                    mesh = self.meshes[(cx, cy)] = MeshGeometry(self.gl_ctx, MapMesh(chunk.tiles, cx * grid.chunk_size, cy * grid.chunk_size))
+                visible.append(mesh)
+        return visible
+
+    def draw_floor(self, meshes, rage_mode):
+        self.program['color'] = COLORS[rage_mode][0]
+        for mesh in meshes:
+            mesh.draw_floor(self.program)
+
+    def draw_walls(self, meshes, rage_mode):
+        self.program['color'] = COLORS[rage_mode][1]
+        for mesh in meshes:
+            mesh.draw_walls(self.program)
@@ -0,0 +1,113 @@
+import numpy as np
+from opensimplex.constants import GRADIENTS2, STRETCH_CONSTANT2, SQUISH_CONSTANT2, NORM_CONSTANT2
+
+from src.consts import *
+
+def extrapolate2(perm, xsb, ysb, dx, dy):
+    index = perm[(perm[xsb & 0xFF] + ysb) & 0xFF] & 0x0E
+    return GRADIENTS2[index] * dx + GRADIENTS2[index + 1] * dy
+
+def contribution(perm, xsb, ysb, dx, dy):
+    attn = 2 - dx * dx - dy * dy
+    inside = attn > 0
+    attn *= attn
+    return np.where(inside, attn * attn * extrapolate2(perm, xsb, ysb, dx, dy), 0.0)
+
+def noise2array(noise, x, y):
+    """
+    OpenSimplex.noise2array computed with whole-array operations, values are identical.
+    opensimplex only runs its array API fast under numba, otherwise it loops over every point in python.
+    Returns an array of shape (len(y), len(x)).
+    """
+    perm = noise._perm
+    x, y = np.meshgrid(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+
+    ## same steps as opensimplex.internals._noise2, branches turned into masks
+    stretch_offset = (x + y) * STRETCH_CONSTANT2
+    xs = x + stretch_offset
+    ys = y + stretch_offset
+    xsb = np.floor(xs)
+    ysb = np.floor(ys)
+
+    squish_offset = (xsb + ysb) * SQUISH_CONSTANT2
+    dx0 = x - (xsb + squish_offset)
+    dy0 = y - (ysb + squish_offset)
+
+    xins = xs - xsb
+    yins = ys - ysb
+    in_sum = xins + yins
+    xsb = xsb.astype(np.int64)
+    ysb = ysb.astype(np.int64)
+
+    value = np.zeros_like(x)
+    value += contribution(perm, xsb + 1, ysb + 0, dx0 - 1 - SQUISH_CONSTANT2, dy0 - 0 - SQUISH_CONSTANT2)
+    value += contribution(perm, xsb + 0, ysb + 1, dx0 - 0 - SQUISH_CONSTANT2, dy0 - 1 - SQUISH_CONSTANT2)
+
+    low = in_sum <= 1
+    x_above = xins > yins
+    near_low = (1 - in_sum > xins) | (1 - in_sum > yins)
+    near_high = (2 - in_sum < xins) | (2 - in_sum < yins)
+    cases = [
+        low & near_low & x_above,
+        low & near_low,
+        low,
+        near_high & x_above,
+        near_high,
+    ]
+    xsv_ext = np.select(cases, [xsb + 1, xsb - 1, xsb + 1, xsb + 2, xsb + 0], xsb)
+    ysv_ext = np.select(cases, [ysb - 1, ysb + 1, ysb + 1, ysb + 0, ysb + 2], ysb)
+    dx_ext = np.select(cases, [
+        dx0 - 1,
+        dx0 + 1,
+        dx0 - 1 - 2 * SQUISH_CONSTANT2,
+        dx0 - 2 - 2 * SQUISH_CONSTANT2,
+        dx0 + 0 - 2 * SQUISH_CONSTANT2,
+    ], dx0)
+    dy_ext = np.select(cases, [
+        dy0 + 1,
+        dy0 - 1,
+        dy0 - 1 - 2 * SQUISH_CONSTANT2,
+        dy0 + 0 - 2 * SQUISH_CONSTANT2,
+        dy0 - 2 - 2 * SQUISH_CONSTANT2,
+    ], dy0)
+
+    ## inside the (1,1) triangle the base vertex moves to (1,1)
+    high = ~low
+    xsb = xsb + high
+    ysb = ysb + high
+    dx0 = np.where(high, dx0 - 1 - 2 * SQUISH_CONSTANT2, dx0)
+    dy0 = np.where(high, dy0 - 1 - 2 * SQUISH_CONSTANT2, dy0)
+
+    value += contribution(perm, xsb, ysb, dx0, dy0)
+    value += contribution(perm, xsv_ext, ysv_ext, dx_ext, dy_ext)
+    return value / NORM_CONSTANT2
+
+def carve_tiles(tiles, rng, noise, x0=0, y0=0, random_ratio=0.1, noise_scale=0.4, noise_threshold=0.2):
+    """
+    Removes `random_ratio` of the walls of `tiles` at random (`rng` is a numpy Generator) and the ones
+    where the simplex `noise` is above `noise_threshold`. (x0, y0) is the position of tiles[0, 0] in the map,
+    so pieces of a map carved separately line up.
+    """
+    h, w = tiles.shape
+    empty = rng.random((h, w)) > 1 - random_ratio
+    empty |= noise2array(noise, (x0 + np.arange(w)) * noise_scale, (y0 + np.arange(h)) * noise_scale) > noise_threshold
+    tiles[empty] = TILE_EMPTY
+    return tiles
+
+def open_hole(tiles, x, y, radius, x0=0, y0=0):
+    """
+    Removes the walls within `radius` of map tile (x, y), the part of the hole outside of `tiles` is ignored.
+    """
+    x, y = x - x0, y - y0
+    tiles[max(y - radius, 0):max(y + radius + 1, 0), max(x - radius, 0):max(x + radius + 1, 0)] = TILE_EMPTY
+    return tiles
+
+def carve(grid, rng, noise, hole_radius=1, **options):
+    """
+    Opens up a generated map in one pass over the whole grid buffer: a hole within `hole_radius`
+    of the center, then carve_tiles.
+    """
+    carve_tiles(grid.tiles, rng, noise, **options)
+    open_hole(grid.tiles, grid.width//2, grid.height//2, hole_radius)
+    grid.invalidate()
+    return grid
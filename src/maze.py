@@ -2,10 +2,16 @@
 # With no remorse
 
 import random
+from array import array
+
+import numpy as np
 
 # Easy to read representation for each cardinal direction.
 N, S, W, E = ('n', 's', 'w', 'e')
 
+## above this many cells PackedMaze gets slow (0.1s at 129x129), maps are drawn with SidewinderMaze
+PACKED_MAZE_MAX_CELLS = 129 * 129
+
 class Cell:
     """
     Class for each individual cell. Knows only its position and which walls are
@@ -223,19 +229,19 @@ class Maze(object):
         # Simple double join to transform list of lists into string.
         return '\n'.join(''.join(line) for line in matrix) + '\n'
 
-    def randomize(self):
+    def randomize(self, rng=random):
         """
         Knocks down random walls to build a random perfect maze.
         Algorithm from http://mazeworks.com/mazegen/mazetut/index.htm
         """
         cell_stack = []
-        cell = random.choice(self.cells)
+        cell = rng.choice(self.cells)
         n_visited_cells = 1
 
         while n_visited_cells < len(self.cells):
             neighbors = [c for c in self.neighbors(cell) if c.is_full()]
             if len(neighbors):
-                neighbor = random.choice(neighbors)
+                neighbor = rng.choice(neighbors)
                 cell.connect(neighbor)
                 cell_stack.append(cell)
                 cell = neighbor
@@ -244,10 +250,126 @@ class Maze(object):
                 cell = cell_stack.pop()
 
     @staticmethod
-    def generate(width, height):
+    def generate(width, height, rng=random):
         """
-        Returns a new random perfect maze with the given sizes.
+        Returns a new random perfect maze with the given sizes, drawn from `rng`.
         """
         m = Maze(width, height)
-        m.randomize()
+        m.randomize(rng)
+        return m
+
+class PackedMaze:
+    """
+    Same mazes as Maze.generate for the same random state, with the state of every cell
+    packed in one byte: VISITED, and whether the passage to the east / south neighbour is open.
+    Meant for big maps, where a Cell object per cell does not fit.
+    """
+    VISITED = 1
+    EAST = 2
+    SOUTH = 4
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.state = bytearray(width * height)
+
+    def randomize(self, rng=random):
+        """
+        Maze.randomize on cell indices, the neighbours are scanned in the same order (N, S, W, E)
+        so the same random draws knock down the same walls.
+        """
+        w, h = self.width, self.height
+        n = w * h
+        state = self.state
+        VISITED, EAST, SOUTH = self.VISITED, self.EAST, self.SOUTH
+        choice = rng.choice
+
+        cell_stack = array('i')
+        cell = choice(range(n))
+        state[cell] = VISITED
+        n_visited_cells = 1
+
+        while n_visited_cells < n:
+            x = cell % w
+            neighbors = []
+            if cell >= w and not state[cell - w]: neighbors.append(cell - w)
+            if cell < n - w and not state[cell + w]: neighbors.append(cell + w)
+            if x > 0 and not state[cell - 1]: neighbors.append(cell - 1)
+            if x < w - 1 and not state[cell + 1]: neighbors.append(cell + 1)
+
+            if neighbors:
+                neighbor = choice(neighbors)
+                d = neighbor - cell
+                if d == w:
+                    state[cell] |= SOUTH
+                elif d == -w:
+                    state[neighbor] |= SOUTH
+                elif d == 1:
+                    state[cell] |= EAST
+                else:
+                    state[neighbor] |= EAST
+                state[neighbor] |= VISITED
+                cell_stack.append(cell)
+                cell = neighbor
+                n_visited_cells += 1
+            else:
+                cell = cell_stack.pop()
+
+    def tiles(self):
+        """
+        The maze as Maze.to_grid lays it out, a (2*height-1, 2*width-1) array:
+        cells on even tiles, walls everywhere else.
+        """
+        state = np.frombuffer(self.state, dtype=np.uint8).reshape(self.height, self.width)
+        tiles = np.ones((self.height * 2 - 1, self.width * 2 - 1), dtype=np.uint8)
+        tiles[0::2, 0::2] = 0
+        tiles[0::2, 1::2] = (state[:, :-1] & self.EAST) == 0
+        tiles[1::2, 0::2] = (state[:-1, :] & self.SOUTH) == 0
+        return tiles
+
+    def write_grid(self, grid):
+        """
+        Writes the maze straight into the buffer of `grid`, cropped when the grid is smaller.
+        """
+        tiles = self.tiles()
+        h = min(grid.height, tiles.shape[0])
+        w = min(grid.width, tiles.shape[1])
+        grid.tiles[:h, :w] = tiles[:h, :w]
+        grid.invalidate()
+        return grid
+
+    def to_grid(self):
+        return self.tiles().ravel().tolist()
+
+    @classmethod
+    def generate(cls, width, height, rng=random):
+        m = cls(width, height)
+        m.randomize(rng)
         return m
+
+class SidewinderMaze(PackedMaze):
+    """
+    Perfect mazes in the PackedMaze layout, drawn with the sidewinder algorithm on whole arrays at once.
+    The first row is one corridor, every other row is split into runs of cells joined east,
+    and each run opens to the row before it from one of its cells, picked at random.
+    Not the same mazes as Maze.generate: the corridors are biased, the first row is straight.
+    """
+    def randomize(self, rng=random):
+        w, h = self.width, self.height
+        rng = np.random.default_rng(rng.getrandbits(64))
+
+        east = rng.random((h, w)) < 0.5
+        east[0] = True
+        east[:, -1] = False
+
+        ## runs of the rows after the first, as flat indices into those rows
+        starts = np.ones((h - 1, w), dtype=bool)
+        starts[:, 1:] = ~east[1:, :-1]
+        starts = np.flatnonzero(starts)
+        lengths = np.diff(starts, append=(h - 1) * w)
+        ## index i of a cell in those rows is the index of the cell before it in the whole maze
+        north = starts + (rng.random(len(starts)) * lengths).astype(np.int64)
+
+        state = np.frombuffer(self.state, dtype=np.uint8).reshape(-1)
+        state[:] = self.VISITED | east.ravel() * self.EAST
+        state[north] |= self.SOUTH
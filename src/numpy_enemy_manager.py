@@ -0,0 +1,225 @@
+import numpy as np
+
+from src import ctx
+from src.consts import *
+from src.vec import Vec2
+from src.utils import clamp
+from src.broadphase import BROADPHASES
+from src.chunks import ChunkedGrid
+from src.dijsktra import DIRECTIONS
+from src.enemy_manager import EnemyManager, ENEMY_SPEED, MAX_VEL, TURNING_WEIGHT, CELL_SIZE
+from src.lod import lod_periods, lod_due
+
+## at most this many enemies are visited per neighbour cell, keeps separation linear when enemies pile up
+MAX_CELL_NEIGHBOURS = 16
+
+class NumpyEnemyManager(EnemyManager):
+    """
+    Same behaviour as EnemyManager, but enemies are stored as a structure of float32 arrays
+    and steered with whole-array operations.
+    Only the first `n` rows of each array are alive.
+    """
+    def __init__(self, capacity=256, broadphase='hashed', lod_bands=None):
+        super().__init__(lod_bands, capacity=0)
+
+        self.n = 0
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.prev_pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.vel = np.zeros((capacity, 2), dtype=np.float32)
+        self.acc = np.zeros((capacity, 2), dtype=np.float32)
+        self.dead = np.zeros(capacity, dtype=bool)
+        ## level of detail: spawn order, and time since the last update
+        self.phase = np.zeros(capacity, dtype=np.int64)
+        self.idle = np.zeros(capacity, dtype=np.float32)
+
+        ## acceleration structure, built for the map size on first use
+        self.broadphase_name = broadphase
+        self.broadphase = None
+        self.pairs = None
+
+
+    def __len__(self):
+        return self.n
+
+    def positions(self):
+        return self.pos[:self.n].tolist()
+
+    def store_previous(self):
+        self.prev_pos[:self.n] = self.pos[:self.n]
+
+    def render_arrays(self, alpha=1.0):
+        if alpha == 1.0:
+            return self.pos[:self.n], self.acc[:self.n]
+        prev = self.prev_pos[:self.n]
+        return prev + (self.pos[:self.n] - prev) * np.float32(alpha), self.acc[:self.n]
+
+    def grow(self):
+        capacity = len(self.pos) * 2
+        for name in ('pos', 'prev_pos', 'vel', 'acc', 'dead', 'phase', 'idle'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def spawn(self, pos):
+        if self.n == len(self.pos):
+            self.grow()
+        i = self.n
+        self.pos[i] = (pos.x, pos.y)
+        self.prev_pos[i] = (pos.x, pos.y)
+        self.vel[i] = 0
+        self.acc[i] = 0
+        self.dead[i] = False
+        self.phase[i] = self.spawned
+        self.idle[i] = 0
+        self.spawned += 1
+        self.n += 1
+
+    def remove_dead(self):
+        """
+        Fills the rows of the enemies killed this tick with the last alive ones.
+        """
+        if len(self.killed) == 0:
+            return
+        killed = np.unique(self.killed)
+        self.killed = []
+        n = self.n
+        m = n - len(killed)
+        holes = killed[killed < m]
+        movers = m + np.flatnonzero(~self.dead[m:n])
+        for arr in (self.pos, self.prev_pos, self.vel, self.acc, self.phase, self.idle):
+            arr[holes] = arr[movers]
+        self.dead[killed] = False
+        self.n = m
+
+    def kill(self, contacts):
+        self.dead[contacts] = True
+        self.killed = contacts
+        return [Vec2(x, y) for x, y in self.pos[contacts].tolist()]
+
+    def computeAccelerationStructure(self):
+        if self.broadphase is None:
+            grid = ctx.sim.grid
+            self.broadphase = BROADPHASES[self.broadphase_name](CELL_SIZE, MAX_CELL_NEIGHBOURS, grid.width*GRID_SCALE, grid.height*GRID_SCALE)
+        self.pairs = self.broadphase.pairs(self.pos[:self.n])
+
+    def scheduled(self, dt):
+        """
+        (enemies, elapsed) for the enemies updating this tick: a slice of all of them and dt without level of detail,
+        otherwise their indices and a (k, 1) array of the time since their last update.
+        """
+        n = self.n
+        distances = self.lod_distances(self.pos[:n]) if self.lod_bands else None
+        if distances is None:
+            self.updates += n
+            return slice(0, n), dt
+
+        self.idle[:n] += dt
+        due = np.flatnonzero(lod_due(lod_periods(distances, self.lod_bands), self.phase[:n], ctx.sim.tick))
+        elapsed = self.idle[due]
+        self.idle[due] = 0
+        self.updates += len(due)
+        return due, elapsed[:, None]
+
+    def compute_self_collision(self, enemies=slice(None)):
+        """
+        Returns the separation velocity to substract from each of `enemies`.
+        """
+        n = self.n
+        i, j = self.pairs
+        if not isinstance(enemies, slice):
+            ## only the pairs pushing the enemies updated
+            updated = np.zeros(n, dtype=bool)
+            updated[enemies] = True
+            keep = updated[i]
+            i, j = i[keep], j[keep]
+
+        pos = self.pos[:n]
+        d = pos[j] - pos[i]
+        l = np.hypot(d[:, 0], d[:, 1])
+
+        close = (0.0 < l) & (l < PLAYER_SIZE)
+        i, d, l = i[close], d[close], l[close]
+        f = 1.0 / (l*10.0) / l
+
+        sep = np.empty((n, 2), dtype=np.float32)
+        sep[:, 0] = np.bincount(i, weights=d[:, 0] * f, minlength=n)
+        sep[:, 1] = np.bincount(i, weights=d[:, 1] * f, minlength=n)
+        return sep[enemies]
+
+    def move_and_collide(self, delta, enemies=None):
+        """
+        Entity.move_and_collide for every enemy, or the ones in `enemies`, in one pass over the grid's collision field.
+        Chunked grids have no field covering the whole map, enemies are moved one by one there.
+        """
+        if enemies is None:
+            enemies = slice(0, self.n)
+        grid = ctx.sim.grid
+        if not isinstance(grid, ChunkedGrid):
+            self.pos[enemies] = grid.collision_field().move_and_collide(self.pos[enemies], delta)
+            return
+
+        half_size = PLAYER_SIZE / 2
+        eps = 0.001
+
+        pos = self.pos[enemies].tolist()
+        for new, d in zip(pos, delta.tolist()):
+            current_tile = grid.tile_quantize(*new)
+            for axis in range(2):
+                new[axis] += d[axis]
+                any_fix = False
+                for sx in (-half_size, half_size):
+                    for sy in (-half_size, half_size):
+                        if grid.tile_at(new[0] + sx, new[1] + sy) != TILE_EMPTY:
+                            any_fix = True
+                if any_fix:
+                    new[axis] = clamp(new[axis], current_tile[axis] + half_size + eps, current_tile[axis] + GRID_SCALE - half_size - eps)
+
+        self.pos[enemies] = np.array(pos, dtype=np.float32).reshape(-1, 2)
+
+    def update_movement(self, dt):
+        if self.n == 0:
+            return
+
+        ## views of the arrays without level of detail, copies written back at the end with it
+        enemies, dt = self.scheduled(dt)
+        player = ctx.sim.player
+        pos = self.pos[enemies]
+        vel = self.vel[enemies]
+        acc = self.acc[enemies]
+
+        delta = np.array((player.pos.x, player.pos.y), dtype=np.float32) - pos
+        ln = np.hypot(delta[:, 0], delta[:, 1])
+        delta /= np.where(ln != 0, ln, 1)[:, None]
+
+        grid_x = (pos[:, 0] / GRID_SCALE).astype(np.int64)
+        grid_y = (pos[:, 1] / GRID_SCALE).astype(np.int64)
+        path_find_dir = DIRECTIONS[ctx.sim.pathFindingMap.direction_codes(grid_x, grid_y, self.rage_mode)]
+
+        if self.rage_mode:
+            delta *= -1
+
+        direction = delta*0.25 + path_find_dir
+        direction_ln = np.hypot(direction[:, 0], direction[:, 1])
+        direction /= np.where(direction_ln != 0, direction_ln, 1)[:, None]
+
+        if self.rage_mode:
+            direction *= np.where(ln < GRID_SCALE * 6, -1, -0.2).astype(np.float32)[:, None]
+
+        ## tuning steps since the last update, more than one with level of detail or below 60 steps per second
+        steps = dt / TUNING_DT
+        prev_vel = vel.copy()
+        vel += direction * (TURNING_WEIGHT * steps)
+        vel_ln = np.hypot(vel[:, 0], vel[:, 1])
+        vel *= np.where(vel_ln > MAX_VEL, MAX_VEL / np.maximum(vel_ln, MAX_VEL), 1).astype(np.float32)[:, None]
+        a = 0.9 ** steps
+        acc *= a
+        acc += (vel - prev_vel) / dt * (1-a)
+
+        vel -= self.compute_self_collision(enemies) * steps
+        self.vel[enemies] = vel
+        self.acc[enemies] = acc
+
+        self.move_and_collide(vel * (ENEMY_SPEED * dt), enemies)
+
+        self.contacts = np.arange(self.n)[enemies][ln < PLAYER_SIZE]
@@ -7,8 +7,10 @@ from src.vec import Vec2
 from src.utils import clamp
 
 class Entity:
+    __slots__ = ()
+
     def move_and_collide(self, delta: Vec2):
-        current_tile = Vec2(*ctx.game.grid.tile_quantize(*self.pos))
+        current_tile = Vec2(*ctx.sim.grid.tile_quantize(*self.pos))
         new = self.pos.copy()
         half_size = PLAYER_SIZE / 2
 
@@ -17,7 +19,7 @@ class Entity:
             any_fix = False
             for sx in (-half_size, half_size):
                 for sy in (-half_size, half_size):
-                    if ctx.game.grid.tile_at(new.x + sx, new.y + sy) != TILE_EMPTY:
+                    if ctx.sim.grid.tile_at(new.x + sx, new.y + sy) != TILE_EMPTY:
                         any_fix = True
             if any_fix:
                 eps = 0.001
@@ -29,26 +31,30 @@ class Player(Entity):
     SIZE = PLAYER_SIZE
     def __init__(self, x, y):
         self.pos = Vec2(x, y)
+        self.prev_pos = self.pos
         self.last_tile = (-1, -1)
 
     def recompute_paths(self):
-        ctx.game.pathFindingMap.compute([(self.last_tile.x // GRID_SCALE, self.last_tile.y // GRID_SCALE)])
+        with ctx.profiler.section('pathfinding'):
+            ctx.sim.pathFindingMap.compute([(self.last_tile.x // GRID_SCALE, self.last_tile.y // GRID_SCALE)])
 
-    def update(self, dt):
-        current_tile = Vec2(*ctx.game.grid.tile_quantize(*self.pos))
+    def update(self, dt, pressed):
+        current_tile = Vec2(*ctx.sim.grid.tile_quantize(*self.pos))
         if current_tile != self.last_tile:
             self.last_tile = current_tile
             self.recompute_paths()
+        elif ctx.sim.congestion_interval and ctx.sim.tick % ctx.sim.congestion_interval == 0:
+            self.recompute_paths()
 
-        dx = ctx.game.pressed[arcade.key.RIGHT] - ctx.game.pressed[arcade.key.LEFT]
-        dy = ctx.game.pressed[arcade.key.UP] - ctx.game.pressed[arcade.key.DOWN]
+        dx = pressed[arcade.key.RIGHT] - pressed[arcade.key.LEFT]
+        dy = pressed[arcade.key.UP] - pressed[arcade.key.DOWN]
 
         if ctx.keyboard == 'qwerty':
-            dx += ctx.game.pressed[arcade.key.D] - ctx.game.pressed[arcade.key.A]
-            dy += ctx.game.pressed[arcade.key.W] - ctx.game.pressed[arcade.key.S]
+            dx += pressed[arcade.key.D] - pressed[arcade.key.A]
+            dy += pressed[arcade.key.W] - pressed[arcade.key.S]
         elif ctx.keyboard == 'azerty':
-            dx += ctx.game.pressed[arcade.key.D] - ctx.game.pressed[arcade.key.Q]
-            dy += ctx.game.pressed[arcade.key.Z] - ctx.game.pressed[arcade.key.S]
+            dx += pressed[arcade.key.D] - pressed[arcade.key.Q]
+            dy += pressed[arcade.key.Z] - pressed[arcade.key.S]
 
         dx = clamp(dx, -1, 1)
         dy = clamp(dy, -1, 1)
@@ -57,5 +63,9 @@ class Player(Entity):
         delta.normalize()
         self.move_and_collide(delta * PLAYER_SPEED * dt)
 
-    def draw(self):
-        arcade.draw_rectangle_filled(self.pos.x, self.pos.y, PLAYER_SIZE, PLAYER_SIZE, color=arcade.color.SAE)
+    def draw(self, alpha=1.0):
+        """
+        `alpha` interpolates between the positions before and after the last step.
+        """
+        pos = self.prev_pos + (self.pos - self.prev_pos) * alpha
+        arcade.draw_rectangle_filled(pos.x, pos.y, PLAYER_SIZE, PLAYER_SIZE, color=arcade.color.SAE)
@@ -0,0 +1,104 @@
+import csv
+from time import perf_counter
+
+import numpy as np
+
+## samples kept per section, older ones are overwritten
+PROFILER_CAPACITY = 4096
+
+class Section:
+    """
+    Times a `with` block into its ring buffer: (frame, milliseconds) per sample.
+    """
+    def __init__(self, profiler, name, capacity):
+        self.profiler = profiler
+        self.name = name
+        self.frames = np.zeros(capacity, dtype=np.int64)
+        self.samples = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = perf_counter() - self.start
+        i = self.count % len(self.samples)
+        self.frames[i] = self.profiler.frame
+        self.samples[i] = elapsed * 1000
+        self.count += 1
+        return False
+
+    def history(self):
+        """
+        (frames, milliseconds) of the samples still in the buffer, oldest first.
+        """
+        n = len(self.samples)
+        if self.count <= n:
+            return self.frames[:self.count], self.samples[:self.count]
+        i = self.count % n
+        return np.roll(self.frames, -i), np.roll(self.samples, -i)
+
+    def percentiles(self, q=(50, 95, 99)):
+        _, samples = self.history()
+        if len(samples) == 0:
+            return [0.0] * len(q)
+        return np.percentile(samples, q).tolist()
+
+class NullSection:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class Profiler:
+    """
+    Scoped timers around the hot paths:
+
+        with ctx.profiler.section('enemies'):
+            ...
+
+    Sections can nest, each one is timed on its own. `frame` is bumped once per rendered frame
+    so hitches can be traced back to the sections that ran during that frame.
+    """
+    def __init__(self, capacity=PROFILER_CAPACITY, enabled=True):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.sections = {}
+        self.frame = 0
+        self.null_section = NullSection()
+
+    def section(self, name):
+        if not self.enabled:
+            return self.null_section
+        section = self.sections.get(name)
+        if section is None:
+            section = self.sections[name] = Section(self, name, self.capacity)
+        return section
+
+    def next_frame(self):
+        self.frame += 1
+
+    def clear(self):
+        self.sections = {}
+        self.frame = 0
+
+    def report(self):
+        """
+        One line per section: p50/p95/p99 and max in milliseconds.
+        """
+        lines = []
+        for name, section in self.sections.items():
+            p50, p95, p99 = section.percentiles()
+            lines.append(f"{name:16} p50 {p50:7.3f}  p95 {p95:7.3f}  p99 {p99:7.3f}  max {section.history()[1].max():7.3f} ms")
+        return lines
+
+    def dump_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('section', 'frame', 'ms'))
+            for name, section in self.sections.items():
+                for frame, ms in zip(*section.history()):
+                    writer.writerow((name, int(frame), f"{ms:.4f}"))
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import struct
+from collections import defaultdict
+
+import arcade
+
+from src import ctx
+from src.simulation import Simulation
+
+MAGIC = b'RHR1'
+
+## the keys Player.update reads, one bit each in the recorded input masks
+RECORDED_KEYS = (
+    arcade.key.LEFT, arcade.key.RIGHT, arcade.key.UP, arcade.key.DOWN,
+    arcade.key.W, arcade.key.A, arcade.key.S, arcade.key.D, arcade.key.Q, arcade.key.Z,
+)
+
+## run of identical input masks: (ticks, mask)
+RUN = struct.Struct('<IH')
+
+def input_mask(pressed):
+    mask = 0
+    for bit, key in enumerate(RECORDED_KEYS):
+        if pressed[key]:
+            mask |= 1 << bit
+    return mask
+
+def pressed_from_mask(mask):
+    pressed = defaultdict(bool)
+    for bit, key in enumerate(RECORDED_KEYS):
+        pressed[key] = bool(mask & (1 << bit))
+    return pressed
+
+def state_digest(sim):
+    """
+    Hash of everything the inputs can influence, two runs ended in the same state if their digests match.
+    """
+    h = hashlib.sha1()
+    h.update(struct.pack('<qdddd?', sim.tick, sim.score, sim.player.pos.x, sim.player.pos.y, sim.sound_limit, sim.game_over))
+    for x, y in sim.enemy_manager.positions():
+        h.update(struct.pack('<dd', x, y))
+    return h.hexdigest()
+
+class Recorder:
+    """
+    Logs the input state of every tick of a simulation, run length encoded.
+
+    File layout: MAGIC, u32 header size, json header (simulation settings, keyboard layout,
+    tick count and final state digest), then (u32 ticks, u16 key mask) runs.
+    """
+    def __init__(self, settings):
+        self.settings = settings
+        self.runs = []
+
+    def record(self, pressed):
+        mask = input_mask(pressed)
+        if self.runs and self.runs[-1][1] == mask:
+            self.runs[-1][0] += 1
+        else:
+            self.runs.append([1, mask])
+
+    def save(self, path, sim):
+        header = json.dumps({
+            'settings': self.settings,
+            'keyboard': ctx.keyboard,
+            'ticks': sim.tick,
+            'digest': state_digest(sim),
+        }).encode()
+
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for ticks, mask in self.runs:
+                f.write(RUN.pack(ticks, mask))
+
+def load(path):
+    """
+    Returns (header, runs) of a recording.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        raise ValueError(f"{path} is not a recording")
+    size, = struct.unpack_from('<I', data, 4)
+    header = json.loads(data[8:8 + size])
+    runs = list(RUN.iter_unpack(data[8 + size:]))
+    return header, runs
+
+def replay(path):
+    """
+    Re-runs a recording headless as fast as possible.
+    Returns the simulation in its final state and whether it matches the recorded one.
+    """
+    header, runs = load(path)
+    ctx.keyboard = header['keyboard']
+
+    sim = Simulation(**header['settings'])
+    for ticks, mask in runs:
+        pressed = pressed_from_mask(mask)
+        for _ in range(ticks):
+            sim.step(pressed)
+    sim.close()
+
+    return sim, state_digest(sim) == header['digest']
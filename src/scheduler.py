@@ -0,0 +1,33 @@
+## simulation steps run at most per rendered frame, past that the simulation slows down
+MAX_STEPS_PER_FRAME = 4
+
+class FixedStepScheduler:
+    """
+    Turns variable frame times into a whole number of simulation steps of 1/`rate` seconds.
+    At most `max_steps` run per frame, the time left over past that is dropped: after a hitch the simulation
+    runs slower for a moment, instead of stalling the next frames with all the steps it missed.
+    `alpha` is how far the frame is between the last two steps, to interpolate what is drawn.
+    """
+    def __init__(self, rate, max_steps=MAX_STEPS_PER_FRAME):
+        self.step = 1 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        ## seconds of simulation dropped so far
+        self.dropped = 0.0
+
+    def advance(self, dt):
+        """
+        Adds a frame of `dt` seconds, returns the number of steps to run for it.
+        """
+        self.accumulator += dt
+        steps = int(self.accumulator / self.step)
+        if steps > self.max_steps:
+            self.dropped += (steps - self.max_steps) * self.step
+            steps = self.max_steps
+            self.accumulator = self.step * steps + self.accumulator % self.step
+        self.accumulator = max(self.accumulator - steps * self.step, 0.0)
+        return steps
+
+    @property
+    def alpha(self):
+        return min(self.accumulator / self.step, 1.0)
@@ -0,0 +1,126 @@
+import random
+import time
+from typing import List
+
+import numpy as np
+import opensimplex
+
+from src import ctx
+from src.consts import *
+from src.player import Player
+from src.enemy_manager import EnemyManager
+from src.numpy_enemy_manager import NumpyEnemyManager
+from src.dijsktra import PathFindingMap, AsyncPathFindingMap
+from src.vec import Vec2
+from src.maze import PackedMaze, SidewinderMaze, PACKED_MAZE_MAX_CELLS
+from src.mapgen import carve
+from src.grid import Grid
+from src.chunks import ChunkedGrid, ChunkedPathFindingMap
+
+## simulation steps per second, DT is the default step
+RATE = 60
+DT = 1/RATE
+## ticks between two updates of the chunks kept around the player and the enemies
+ACTIVITY_INTERVAL = 30
+## seconds between two refreshes of the congestion costs while the player stays on one tile, in 'incremental' path mode
+CONGESTION_REFRESH = 0.25
+
+## enemy engines, the per-object one is the reference implementation
+ENGINES = {
+    'object': EnemyManager,
+    'numpy': NumpyEnemyManager,
+}
+
+class Simulation:
+    """
+    Game state stepped at a fixed 1/`rate` seconds, without any window or GL context.
+    The positions before the last step are kept for the renderer to interpolate.
+    Rendering and audio are left to the caller through `blood_splashes`, `sounds` and `game_over`.
+    """
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, seed=None, engine='object', engine_options=None, path_mode='full', path_worker=None, chunked=False, rate=RATE):
+        ctx.sim = self
+
+        if seed is None:
+            seed = int(time.time())
+        self.seed = seed
+        ## everything needed to rebuild the same simulation, see src/replay.py
+        self.settings = dict(width=width, height=height, seed=seed, engine=engine, engine_options=engine_options, path_mode=path_mode, chunked=chunked, rate=rate)
+        ## every random draw of the session goes through this, so a seed and the inputs replay a game exactly
+        self.rng = random.Random(seed)
+        self.dt = 1 / rate
+        ## the paths follow the enemies between two moves of the player when repairing them is cheap
+        self.congestion_interval = max(1, round(rate * CONGESTION_REFRESH)) if path_mode == 'incremental' else 0
+
+        ## chunked maps are generated around the player and the enemies as they move
+        self.chunked = chunked
+        if chunked:
+            assert path_worker is None, "chunked maps compute their paths synchronously"
+            assert path_mode != 'precomputed', "chunked maps move their path window, an all-pairs table can't follow it"
+            self.grid = ChunkedGrid(width, height, seed)
+            self.pathFindingMap = ChunkedPathFindingMap(self, mode=path_mode)
+        else:
+            self.grid = self.generate_map(width, height, self.rng, opensimplex.OpenSimplex(seed))
+            if path_worker is not None:
+                self.pathFindingMap = AsyncPathFindingMap(self, mode=path_mode, worker=path_worker)
+            else:
+                self.pathFindingMap = PathFindingMap(self, mode=path_mode)
+
+        self.player = Player(x=(width*GRID_SCALE)/2, y=(height*GRID_SCALE)/2)
+        self.enemy_manager = ENGINES[engine](**(engine_options or {}))
+
+        ## events of the last step
+        self.blood_splashes: List[Vec2] = []
+        self.sounds = []
+
+        self.score = 0
+        self.sound_limit = 0
+        self.tick = 0
+        self.game_over = False
+
+    @staticmethod
+    def generate_map(width, height, rng, noise):
+        grid = Grid(width=width, height=height)
+        cells_x, cells_y = width//2 + 1, height//2 + 1
+        maze = PackedMaze if cells_x * cells_y <= PACKED_MAZE_MAX_CELLS else SidewinderMaze
+        maze.generate(cells_x, cells_y, rng).write_grid(grid)
+
+        ## remove walls at center, at random and with simplex noise
+        return carve(grid, np.random.default_rng(rng.getrandbits(64)), noise)
+
+    def close(self):
+        self.pathFindingMap.close()
+
+    def alloc_sound(self):
+        if self.sound_limit > 1:
+            self.sound_limit -= 1
+            return True
+        return False
+
+    def end_game(self):
+        self.game_over = True
+
+    def step(self, pressed):
+        """
+        Advances the simulation by one dt with `pressed` as the keyboard state (key -> bool).
+        """
+        ctx.sim = self
+
+        self.blood_splashes = []
+        self.sounds = []
+
+        self.score += SCORE_PER_SECOND * self.dt
+        if self.sound_limit < 8:
+            self.sound_limit += 8 * self.dt
+
+        self.player.prev_pos = self.player.pos
+        self.enemy_manager.store_previous()
+
+        with ctx.profiler.section('player'):
+            self.player.update(self.dt, pressed)
+        if self.chunked and self.tick % ACTIVITY_INTERVAL == 0:
+            with ctx.profiler.section('chunks'):
+                self.grid.update_activity([self.player.pos, *self.enemy_manager.positions()])
+        with ctx.profiler.section('enemies'):
+            self.enemy_manager.update(self.dt)
+
+        self.tick += 1
@@ -1,6 +1,9 @@
 import array
 import math
 from numbers import Number
+
+import numpy as np
+
 NUMERICAL = Number
 
 class VecBase:
@@ -215,4 +218,212 @@ class Vec2(VecBase):
         return Vec2(-x, y)
 
     def copy(self):
-        return Vec2(self.x, self.y)
\ No newline at end of file
+        return Vec2(self.x, self.y)
+
+
+def _on_copy(name):
+    def method(self, *args):
+        return getattr(self.vec(), name)(*args)
+    method.__name__ = name
+    return method
+
+class Vec2Row(Vec2):
+    """
+    Zero-copy view of one row of a Vec2Array, as a **Vec2**: `x`, `y`, indexing and `normalize`
+    read and write the array, the operations building a new vector return a plain Vec2.
+    """
+    __slots__ = ("row",)
+    def __init__(self, row):
+        self.row = row
+
+    @property
+    def x(self):
+        return self.row[0].item()
+
+    @x.setter
+    def x(self, value):
+        self.row[0] = value
+
+    @property
+    def y(self):
+        return self.row[1].item()
+
+    @y.setter
+    def y(self, value):
+        self.row[1] = value
+
+    def vec(self) -> Vec2:
+        return Vec2(self.x, self.y)
+
+    map_by_verticle = _on_copy('map_by_verticle')
+    __sub__ = _on_copy('__sub__')
+    __mul__ = _on_copy('__mul__')
+    __truediv__ = _on_copy('__truediv__')
+    __floordiv__ = _on_copy('__floordiv__')
+    __pos__ = _on_copy('__pos__')
+    __neg__ = _on_copy('__neg__')
+    __abs__ = _on_copy('__abs__')
+    normalized = _on_copy('normalized')
+    as_n_d = _on_copy('as_n_d')
+
+    def __repr__(self):
+        return "Vec2Row(" + ", ".join(map(str, self)) + ")"
+
+
+class Vec2Array:
+    """
+    N 2-dimensional vectors backed by an Nx2 numpy array, mirrors the **Vec2** API
+    with whole-array operations. `arr[i]` is a **Vec2Row** view of row i, slices are Vec2Array views.
+    Operands can be a Vec2Array, a Vec2, a number, or anything numpy broadcasts against (N, 2):
+    a pair of numbers applies per axis, one number per row needs an (N, 1) array.
+    """
+    __slots__ = ("data",)
+    def __init__(self, data, dtype=np.float32):
+        self.data = np.asarray(data, dtype=dtype).reshape(-1, 2)
+
+    @classmethod
+    def zeros(cls, n, dtype=np.float32):
+        return cls(np.zeros((n, 2), dtype=dtype))
+
+    @classmethod
+    def from_vecs(cls, vecs, dtype=np.float32):
+        return cls([(v.x, v.y) for v in vecs], dtype=dtype)
+
+    @property
+    def x(self):
+        return self.data[:, 0]
+
+    @x.setter
+    def x(self, value):
+        self.data[:, 0] = value
+
+    @property
+    def y(self):
+        return self.data[:, 1]
+
+    @y.setter
+    def y(self, value):
+        self.data[:, 1] = value
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return (Vec2(x, y) for x, y in self.data.tolist())
+
+    def __repr__(self):
+        return "Vec2Array(" + repr(self.data.tolist()) + ")"
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return Vec2Row(self.data[key])
+        return Vec2Array(self.data[key], dtype=self.data.dtype)
+
+    def __setitem__(self, key, value):
+        self.data[key] = self._operand(value)
+
+    def vec(self, i) -> Vec2:
+        """
+        Returns a Vec2 copy of row i.
+        """
+        x, y = self.data[i].tolist()
+        return Vec2(x, y)
+
+    def _operand(self, other):
+        if isinstance(other, Vec2Array):
+            return other.data
+        if isinstance(other, VecBase):
+            return np.array(tuple(other), dtype=self.data.dtype)
+        return other
+
+    def __add__(self, other):
+        return Vec2Array(self.data + self._operand(other), dtype=self.data.dtype)
+
+    def __iadd__(self, other):
+        self.data += self._operand(other)
+        return self
+
+    def __sub__(self, other):
+        return Vec2Array(self.data - self._operand(other), dtype=self.data.dtype)
+
+    def __isub__(self, other):
+        self.data -= self._operand(other)
+        return self
+
+    def __mul__(self, other):
+        return Vec2Array(self.data * self._operand(other), dtype=self.data.dtype)
+
+    __rmul__ = __mul__
+
+    def __imul__(self, other):
+        self.data *= self._operand(other)
+        return self
+
+    def __truediv__(self, other):
+        return Vec2Array(self.data / self._operand(other), dtype=self.data.dtype)
+
+    def __itruediv__(self, other):
+        self.data /= self._operand(other)
+        return self
+
+    def __neg__(self):
+        return Vec2Array(-self.data, dtype=self.data.dtype)
+
+    def __abs__(self):
+        return Vec2Array(np.abs(self.data), dtype=self.data.dtype)
+
+    def dot(self, other):
+        """
+        Dot product of every row.
+        """
+        return (self.data * self._operand(other)).sum(axis=1)
+
+    def len_sqr(self):
+        """
+        Returns the squared length of every row.
+        """
+        return self.data[:, 0]**2 + self.data[:, 1]**2
+
+    def len(self):
+        """
+        Returns the length of every row.
+        """
+        return np.hypot(self.data[:, 0], self.data[:, 1])
+
+    def normalize(self):
+        """
+        Normalizes every row in-place, zero rows are left untouched. Returns the lengths.
+        """
+        ln = self.len()
+        self.data /= np.where(ln != 0, ln, 1)[:, None]
+        return ln
+
+    def normalized(self):
+        """
+        Returns a normalized copy.
+        """
+        other = self.copy()
+        other.normalize()
+        return other
+
+    def clamped(self, max_ln):
+        """
+        Returns a copy with every row longer than `max_ln` scaled down to `max_ln`.
+        """
+        ln = self.len()
+        scale = np.where(ln > max_ln, max_ln / np.maximum(ln, max_ln), 1).astype(self.data.dtype)
+        return Vec2Array(self.data * scale[:, None], dtype=self.data.dtype)
+
+    def perpendicular(self):
+        return Vec2Array(np.stack((-self.data[:, 1], self.data[:, 0]), axis=1), dtype=self.data.dtype)
+
+    def rotate(self, angle) -> "Vec2Array":
+        """
+        Rotate every row by *angle*, like **Vec2.rotate**
+        """
+        c, s = math.cos(angle), math.sin(angle)
+        x, y = self.data[:, 0], self.data[:, 1]
+        return Vec2Array(np.stack((x*c - y*s, x*s + y*c), axis=1), dtype=self.data.dtype)
+
+    def copy(self):
+        return Vec2Array(self.data.copy(), dtype=self.data.dtype)
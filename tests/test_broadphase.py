@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from src.broadphase import BROADPHASES
+
+CELL_SIZE = 1.0
+
+def close_pairs(pos):
+    """
+    Every directed pair closer than CELL_SIZE on both axes, by brute force.
+    """
+    d = np.abs(pos[:, None, :] - pos[None, :, :])
+    close = (d < CELL_SIZE).all(axis=2)
+    np.fill_diagonal(close, False)
+    return sorted(zip(*map(np.ndarray.tolist, np.nonzero(close))))
+
+@pytest.mark.parametrize('name', BROADPHASES.keys())
+@pytest.mark.parametrize('n', [1, 2, 7, 50, 300])
+def test_pairs_are_the_close_pairs_once(name, n):
+    ## few points on a small world, so the hashed buckets collide a lot
+    pos = np.random.default_rng(n).uniform(0, 12, (n, 2)).astype(np.float32)
+    broadphase = BROADPHASES[name](CELL_SIZE, max_neighbours=n, width=12, height=12)
+    i, j = broadphase.pairs(pos)
+
+    candidates = list(zip(i.tolist(), j.tolist()))
+    assert len(candidates) == len(set(candidates))
+    close = (np.abs(pos[i] - pos[j]) < CELL_SIZE).all(axis=1)
+    found = sorted(pair for pair, keep in zip(candidates, close) if keep)
+    assert found == close_pairs(pos)
+
+def test_no_points():
+    for broadphase in BROADPHASES.values():
+        i, j = broadphase(CELL_SIZE, 16).pairs(np.zeros((0, 2), dtype=np.float32))
+        assert len(i) == len(j) == 0
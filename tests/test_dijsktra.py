@@ -0,0 +1,29 @@
+import random
+
+import numpy as np
+
+from src.dijsktra import PathFindingMap
+from src.simulation import Simulation
+
+def distances(path_map):
+    return [max(d, -1) for d in path_map.dijkstra]
+
+def test_incremental_repair_matches_full():
+    sim = Simulation(65, 37, seed=2)
+    walkable = np.flatnonzero(sim.grid.walkable).tolist()
+    incremental, full = PathFindingMap(sim, 'incremental'), PathFindingMap(sim, 'full')
+    rng = random.Random(0)
+    target = divmod(walkable[len(walkable) // 2], sim.grid.width)[::-1]
+
+    costs = [0] * (sim.grid.width * sim.grid.height)
+    for step in range(6):
+        costs = list(costs)
+        for i in rng.sample(walkable, 20):
+            costs[i] += rng.randint(-1, 2) if costs[i] else rng.randint(0, 3)
+        ## the first compute rebuilds, the next ones only see the costs change
+        dirty = incremental.compute_incremental([target], costs)
+        assert (dirty is None) == (step == 0)
+        incremental.computeGradient(dirty)
+        full.compute([target], costs)
+        assert distances(incremental) == distances(full)
+        assert (incremental.directions == full.directions).all()
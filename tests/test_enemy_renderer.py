@@ -0,0 +1,43 @@
+import numpy as np
+
+from src.consts import *
+from src.enemy_renderer import MAX_STRETCH, STRETCH_FACTOR, enemy_vertices
+
+def quads(vertices):
+    return vertices.reshape(-1, 6, 2)
+
+def test_six_vertices_per_enemy():
+    pos = np.random.default_rng(0).uniform(0, 100, (7, 2))
+    acc = np.random.default_rng(1).uniform(-5, 5, (7, 2))
+    for stretch in (False, True):
+        vertices = enemy_vertices(pos, acc, stretch)
+        assert vertices.shape == (7 * 6, 2)
+        assert vertices.dtype == np.float32
+
+def test_unstretched_corners():
+    pos = np.array([(10.0, 20.0), (3.5, -2.25)])
+    acc = np.array([(4.0, 0.0), (0.0, 4.0)])
+    for quad, p in zip(quads(enemy_vertices(pos, acc, stretch=False)), pos):
+        assert np.allclose(quad.min(axis=0), p - PLAYER_SIZE/2)
+        assert np.allclose(quad.max(axis=0), p + PLAYER_SIZE/2)
+
+def test_stretched_size():
+    ## horizontal, vertical, clamped both ways, and balanced accelerations
+    acc = np.array([(1.0, 0.0), (0.0, 2.0), (30.0, 1.0), (-1.0, 40.0), (3.0, -3.0)])
+    pos = np.zeros_like(acc)
+    for quad, (ax, ay) in zip(quads(enemy_vertices(pos, acc, stretch=True)), acc):
+        v = np.clip((abs(ax) - abs(ay)) * STRETCH_FACTOR, -MAX_STRETCH, MAX_STRETCH)
+        assert np.allclose(quad.max(axis=0) - quad.min(axis=0), (PLAYER_SIZE * (1 + v), PLAYER_SIZE * (1 - v)))
+        ## the bottom left corner stays put
+        assert np.allclose(quad.min(axis=0), -PLAYER_SIZE/2)
+
+def test_stretch_clamp():
+    acc = np.array([(100.0, 0.0), (0.0, 100.0)])
+    wide, tall = quads(enemy_vertices(np.zeros_like(acc), acc, stretch=True))
+    assert np.allclose(np.ptp(wide, axis=0), (PLAYER_SIZE * 1.25, PLAYER_SIZE * 0.75))
+    assert np.allclose(np.ptp(tall, axis=0), (PLAYER_SIZE * 0.75, PLAYER_SIZE * 1.25))
+
+def test_no_enemies():
+    empty = np.zeros((0, 2))
+    for stretch in (False, True):
+        assert enemy_vertices(empty, empty, stretch).shape == (0, 2)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from src.consts import *
+from src.map_mesh import QUAD_CORNERS, MapMesh, coverage, greedy_rectangles, rectangles_vertices
+from src.simulation import Simulation
+
+def generated_tiles(seed):
+    return Simulation(33, 19, seed=seed).grid.tiles.copy()
+
+def random_tiles(seed, shape=(23, 41)):
+    return np.random.default_rng(seed).choice([TILE_EMPTY, TILE_WALL], size=shape).astype(np.uint8)
+
+def l_shape():
+    mask = np.zeros((3, 3), dtype=bool)
+    mask[0, :] = True
+    mask[:, 0] = True
+    return mask
+
+@pytest.mark.parametrize('tiles', [generated_tiles(1), generated_tiles(2), random_tiles(0), random_tiles(1)])
+def test_mesh_covers_tiles_exactly(tiles):
+    mesh = MapMesh(tiles)
+    assert (coverage(mesh.floor_rects, tiles.shape) == (tiles == TILE_EMPTY)).all()
+    assert (coverage(mesh.wall_rects, tiles.shape) == (tiles == TILE_WALL)).all()
+    assert len(mesh.vertices) == mesh.floor_vertices + mesh.wall_vertices
+
+@pytest.mark.parametrize('mask', [np.ones((5, 7), dtype=bool), np.indices((6, 6)).sum(axis=0) % 2 == 0, l_shape()])
+def test_rectangles_vertices_count(mask):
+    rects = greedy_rectangles(mask)
+    assert len(rectangles_vertices(rects)) == len(QUAD_CORNERS) * len(rects) == 6 * len(rects)
+
+def test_solid_block():
+    rects = greedy_rectangles(np.ones((5, 7), dtype=bool))
+    assert rects.tolist() == [[0, 0, 7, 5]]
+
+def test_checkerboard():
+    mask = np.indices((6, 6)).sum(axis=0) % 2 == 0
+    rects = greedy_rectangles(mask)
+    assert len(rects) == mask.sum()
+    assert (coverage(rects, mask.shape) == mask).all()
+
+def test_l_shape():
+    rects = greedy_rectangles(l_shape())
+    assert rects.tolist() == [[0, 0, 3, 1], [0, 1, 1, 2]]
+
+def test_empty_mask():
+    rects = greedy_rectangles(np.zeros((4, 4), dtype=bool))
+    assert rects.shape == (0, 4)
+    assert rectangles_vertices(rects).shape == (0, 2)
+
+def test_vertices_in_world_coordinates():
+    rects = np.array([(1, 2, 3, 1)], dtype=np.int32)
+    vertices = rectangles_vertices(rects, x0=10, y0=20)
+    assert vertices.min(axis=0).tolist() == [11 * GRID_SCALE, 22 * GRID_SCALE]
+    assert vertices.max(axis=0).tolist() == [14 * GRID_SCALE, 23 * GRID_SCALE]
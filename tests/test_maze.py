@@ -0,0 +1,36 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.maze import Maze, PackedMaze, SidewinderMaze
+
+def reachable(tiles):
+    """
+    Open tiles reachable from the first cell.
+    """
+    seen = np.zeros(tiles.shape, dtype=bool)
+    seen[0, 0] = True
+    stack = [(0, 0)]
+    h, w = tiles.shape
+    while stack:
+        y, x = stack.pop()
+        for ny, nx in ((y + 1, x), (y - 1, x), (y, x + 1), (y, x - 1)):
+            if 0 <= ny < h and 0 <= nx < w and not seen[ny, nx] and tiles[ny, nx] == 0:
+                seen[ny, nx] = True
+                stack.append((ny, nx))
+    return seen
+
+@pytest.mark.parametrize('maze', [PackedMaze, SidewinderMaze])
+@pytest.mark.parametrize('width, height', [(1, 1), (1, 9), (9, 1), (2, 2), (17, 10), (64, 31)])
+def test_perfect_maze(maze, width, height):
+    tiles = maze.generate(width, height, random.Random(width * 100 + height)).tiles()
+    passages = (tiles[0::2, 1::2] == 0).sum() + (tiles[1::2, 0::2] == 0).sum()
+    ## a spanning tree of the cells: connected with one passage less than cells
+    assert passages == width * height - 1
+    assert reachable(tiles)[0::2, 0::2].all()
+
+def test_packed_maze_matches_maze():
+    maze = Maze.generate(17, 10, random.Random(3))
+    packed = PackedMaze.generate(17, 10, random.Random(3))
+    assert packed.to_grid() == maze.to_grid()
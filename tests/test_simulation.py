@@ -0,0 +1,32 @@
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from src.consts import *
+from src.simulation import Simulation, ENGINES
+from src.vec import Vec2
+
+def enemy_after(engine, rate, start, seconds=0.5):
+    """
+    Position of a single enemy chasing an idle player for `seconds`.
+    """
+    sim = Simulation(33, 19, seed=3, engine=engine, rate=rate)
+    sim.enemy_manager.until_spawn = float('inf')
+    sim.enemy_manager.spawn(Vec2(*start))
+    for _ in range(round(seconds * rate)):
+        sim.step(defaultdict(bool))
+    return np.array(list(sim.enemy_manager.positions())[0], dtype=np.float64)
+
+@pytest.mark.parametrize('engine', ENGINES.keys())
+def test_rate_does_not_change_enemy_motion(engine):
+    sim = Simulation(33, 19, seed=3)
+    sim.step(defaultdict(bool))
+    ## a tile 12 steps away from the player
+    i = int(np.flatnonzero(np.array(sim.pathFindingMap.dijkstra) == 12)[0])
+    start = ((i % 33 + 0.5) * GRID_SCALE, (i // 33 + 0.5) * GRID_SCALE)
+
+    reference = enemy_after(engine, 60, start)
+    assert np.hypot(*(reference - start)) > 1.0
+    for rate in (30, 120):
+        assert np.hypot(*(enemy_after(engine, rate, start) - reference)) < 0.25
@@ -0,0 +1,88 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.vec import Vec2, Vec2Array, Vec2Row
+
+ROWS = [(3.0, 4.0), (-1.5, 0.25), (0.0, 0.0), (10.0, -7.0)]
+
+@pytest.fixture
+def arr():
+    return Vec2Array(ROWS, dtype=np.float64)
+
+def vecs():
+    return [Vec2(x, y) for x, y in ROWS]
+
+def assert_rows(result, expected):
+    assert len(result) == len(expected)
+    for row, vec in zip(result, expected):
+        assert row.x == pytest.approx(vec.x) and row.y == pytest.approx(vec.y)
+
+def test_arithmetic_matches_vec2(arr):
+    other = Vec2(0.5, -2.0)
+    assert_rows(arr + other, [v + other for v in vecs()])
+    assert_rows(arr - other, [v - other for v in vecs()])
+    assert_rows(arr * other, [v * other for v in vecs()])
+    assert_rows(arr * 3, [v * 3 for v in vecs()])
+    assert_rows(arr / 4, [v / 4 for v in vecs()])
+    assert_rows(arr / other, [v / other for v in vecs()])
+    assert_rows(-arr, [-v for v in vecs()])
+    assert_rows(abs(arr), [abs(v) for v in vecs()])
+    assert_rows(arr + arr, [v + v for v in vecs()])
+
+def test_in_place_matches_vec2(arr):
+    other = Vec2(0.5, -2.0)
+    arr += other
+    arr *= 2
+    arr -= Vec2(1, 1)
+    assert_rows(arr, [(v + other) * 2 - Vec2(1, 1) for v in vecs()])
+
+def test_geometry_matches_vec2(arr):
+    other = Vec2(0.5, -2.0)
+    assert arr.dot(other) == pytest.approx([v.dot(other) for v in vecs()])
+    assert arr.len() == pytest.approx([v.len() for v in vecs()])
+    assert arr.len_sqr() == pytest.approx([v.len_sqr() for v in vecs()])
+    assert_rows(arr.normalized(), [v.normalized() for v in vecs()])
+    assert_rows(arr.clamped(2.0), [v.clamped(2.0) for v in vecs()])
+    assert_rows(arr.perpendicular(), [v.perpendicular() for v in vecs()])
+    assert_rows(arr.rotate(0.7), [v.rotate(0.7) for v in vecs()])
+
+    lengths = arr.normalize()
+    expected = vecs()
+    assert lengths == pytest.approx([v.normalize() for v in expected])
+    assert_rows(arr, expected)
+
+def test_row_is_a_vec2_view(arr):
+    row = arr[1]
+    assert isinstance(row, Vec2Row) and isinstance(row, Vec2)
+    assert (row.x, row.y) == ROWS[1]
+    assert row == Vec2(*ROWS[1])
+    assert row + Vec2(1, 1) == Vec2(-0.5, 1.25)
+    assert type(row * 2) is Vec2
+
+    row.x = 6.0
+    row[1] = 8.0
+    assert arr.data[1].tolist() == [6.0, 8.0]
+    assert row.normalize() == 10.0
+    assert arr.data[1].tolist() == pytest.approx([0.6, 0.8])
+    assert arr.vec(1) == row
+
+def test_slices_are_views(arr):
+    arr[1:3] += Vec2(1, 1)
+    assert arr.data[1].tolist() == [-0.5, 1.25]
+    assert arr.data[0].tolist() == [3.0, 4.0]
+
+def test_array_operands_do_not_depend_on_length():
+    axes = np.array([10.0, 100.0])
+    for n in (2, 3):
+        arr = Vec2Array(ROWS[:n], dtype=np.float64)
+        assert_rows(arr * axes, [v * Vec2(10, 100) for v in vecs()[:n]])
+
+    per_row = np.array([[2.0], [3.0]])
+    assert_rows(Vec2Array(ROWS[:2], dtype=np.float64) * per_row, [v * k for v, k in zip(vecs(), (2, 3))])
+    with pytest.raises(ValueError):
+        Vec2Array(ROWS[:3]) * np.array([1.0, 2.0, 3.0])
+
+def test_rotate_quarter_turn():
+    assert_rows(Vec2Array([(1, 0)]).rotate(math.pi / 2), [Vec2(0, 1)])